@@ -0,0 +1,263 @@
+import asyncio
+import json
+import os
+from contextlib import asynccontextmanager
+from typing import List, Optional
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from database.vector_store import VectorDatabase, storage_settings_from_env
+from chat.openai_client import AsyncOpenAIClient, OpenAIClient
+from chat.conversation_handler import ConversationHandler
+from prompts.prompts import build_answer_prompts, count_prompt_tokens
+from database.table_index import format_lookup_answer
+from chat.answer_cache import AnswerCache, load_warmup_questions, retrieval_matches_warm_up, start_warm_up
+
+# Workers share the document through a Chroma server (CHROMA_HOST) and the local indexes in
+# the same directory; without a Chroma server, run a single worker
+COLLECTION_NAME = os.getenv("RAG_COLLECTION", "streamlit_pdf_db")
+PERSIST_DIRECTORY = os.getenv("RAG_PERSIST_DIRECTORY", "./streamlit_chroma_db")
+
+
+class Exchange(BaseModel):
+    user_query: str
+    assistant_response: str
+
+
+class SearchRequest(BaseModel):
+    query: str
+    n_results: int = 3
+    mmr: bool = False
+    lambda_mult: float = 0.5
+
+
+class AnswerRequest(SearchRequest):
+    role: str = "standard"
+    history: List[Exchange] = []
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Shared clients for the lifetime of the worker
+    app.state.vector_db = VectorDatabase(
+        collection_name=COLLECTION_NAME,
+        persist_directory=PERSIST_DIRECTORY,
+        **storage_settings_from_env()
+    )
+    app.state.openai_client = AsyncOpenAIClient()
+    app.state.answer_cache = AnswerCache(os.path.join(PERSIST_DIRECTORY, "answer_cache.sqlite3"))
+    yield
+    await app.state.openai_client.close()
+
+
+app = FastAPI(title="RagApp API", lifespan=lifespan)
+
+
+def format_sse(event: str, data) -> str:
+    """Format a Server-Sent Event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def format_sources(results):
+    """Turn search results into a list of source dicts."""
+    return [
+        {"id": chunk_id, "document": doc, "metadata": metadata, "distance": distance}
+        for chunk_id, doc, metadata, distance in zip(
+            results["ids"][0],
+            results["documents"][0],
+            results["metadatas"][0],
+            results["distances"][0]
+        )
+    ]
+
+
+async def refresh_document(request: Request):
+    """Pick up a document processed by another worker since the last request."""
+    await asyncio.to_thread(request.app.state.vector_db.refresh)
+
+
+async def retrieve(request: Request, body: SearchRequest):
+    """Run the (blocking) vector search in a worker thread."""
+    return await asyncio.to_thread(
+        request.app.state.vector_db.search,
+        body.query,
+        n_results=body.n_results,
+        mmr=body.mmr,
+        lambda_mult=body.lambda_mult
+    )
+
+
+async def prepare_answer(request: Request, body: AnswerRequest):
+    """Retrieve context and build the prompts for an answer request."""
+    results = await retrieve(request, body)
+    if not results["documents"] or not results["documents"][0]:
+        raise HTTPException(status_code=404, detail="No relevant information found in the document.")
+    
+    # Rebuild the conversation from the request so workers stay stateless
+    conversation_handler = ConversationHandler()
+    for exchange in body.history:
+        conversation_handler.add_exchange(exchange.user_query, exchange.assistant_response)
+    
+    system_prompt, user_prompt, _ = build_answer_prompts(body.query, results, body.role, conversation_handler)
+    return results, system_prompt, user_prompt
+
+
+async def get_cached_answer(request: Request, body: AnswerRequest):
+    """
+    Look up an answer precomputed after ingest (see chat.answer_cache).
+    
+    Returns:
+        Tuple of (answer, sources), or None if the question was not answered ahead of time
+    """
+    # Follow-up questions depend on the conversation, and other retrieval settings on
+    # different excerpts, so they are never served from the cache
+    if body.history or not retrieval_matches_warm_up(body.n_results, body.mmr):
+        return None
+    
+    vector_db = request.app.state.vector_db
+    cached = await asyncio.to_thread(
+        request.app.state.answer_cache.get,
+        vector_db.document_version,
+        body.role,
+        body.query
+    )
+    if cached is None:
+        return None
+    
+    documents = await asyncio.to_thread(vector_db.get_chunks, cached["source_ids"])
+    sources = [
+        {"id": chunk_id, "document": doc, "distance": distance}
+        for chunk_id, doc, distance in zip(cached["source_ids"], documents, cached["source_distances"])
+    ]
+    return cached["answer"], sources
+
+
+def format_table_source(fact):
+    """Turn a table lookup into a source dict."""
+    return {"table": fact["table"], "page": fact["page"], "metric": fact["metric"]}
+
+
+@app.post("/documents")
+async def ingest_document(request: Request, filename: Optional[str] = None, warm_up: bool = False):
+    """
+    Process a PDF sent as the raw request body, replacing the current document.
+    
+    With warm_up=true the common questions (WARMUP_QUESTIONS_FILE) are answered in a
+    background thread after processing, so they can be served from the answer cache.
+    """
+    pdf_bytes = await request.body()
+    if not pdf_bytes:
+        raise HTTPException(status_code=400, detail="Request body must contain a PDF file.")
+    
+    try:
+        chunk_ids, pdf_info = await asyncio.to_thread(
+            request.app.state.vector_db.process_pdf,
+            pdf_bytes,
+            filename=filename
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing PDF: {str(e)}")
+    
+    # Answers for the previous document no longer apply
+    vector_db = request.app.state.vector_db
+    await asyncio.to_thread(request.app.state.answer_cache.invalidate, vector_db.document_version)
+    if warm_up:
+        start_warm_up(
+            vector_db,
+            OpenAIClient(),
+            request.app.state.answer_cache,
+            load_warmup_questions(os.getenv("WARMUP_QUESTIONS_FILE"))
+        )
+    
+    return {"chunks": len(chunk_ids), "pdf_info": pdf_info, "warm_up": warm_up}
+
+
+@app.get("/documents")
+async def document_info(request: Request):
+    """Get information about the currently processed document."""
+    await refresh_document(request)
+    return await asyncio.to_thread(request.app.state.vector_db.get_collection_info)
+
+
+@app.post("/search")
+async def search(request: Request, body: SearchRequest):
+    """Search the document for chunks relevant to the query."""
+    await refresh_document(request)
+    results = await retrieve(request, body)
+    return {"results": format_sources(results)}
+
+
+@app.post("/answer")
+async def answer(request: Request, body: AnswerRequest):
+    """Answer a question about the document."""
+    await refresh_document(request)
+    
+    # Plain metric questions are answered straight from the table index
+    fact = request.app.state.vector_db.lookup_metric(body.query)
+    if fact is not None:
+        return {"answer": format_lookup_answer(fact), "sources": [format_table_source(fact)], "usage": {}}
+    
+    cached = await get_cached_answer(request, body)
+    if cached is not None:
+        return {"answer": cached[0], "sources": cached[1], "usage": {}}
+    
+    results, system_prompt, user_prompt = await prepare_answer(request, body)
+    try:
+        response, usage = await request.app.state.openai_client.get_response_with_usage(
+            prompt=user_prompt,
+            system_prompt=system_prompt
+        )
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    
+    usage = {**usage, "prompt_tokens_estimate": count_prompt_tokens(system_prompt, user_prompt)}
+    return {"answer": response, "sources": format_sources(results), "usage": usage}
+
+
+@app.post("/answer/stream")
+async def answer_stream(request: Request, body: AnswerRequest):
+    """
+    Answer a question about the document as a Server-Sent Events stream.
+    
+    Emits one "sources" event, a "token" event per response chunk and a final
+    "done" event (or an "error" event if generation fails).
+    """
+    await refresh_document(request)
+    
+    fact = request.app.state.vector_db.lookup_metric(body.query)
+    if fact is not None:
+        async def lookup_events():
+            yield format_sse("sources", [format_table_source(fact)])
+            yield format_sse("token", format_lookup_answer(fact))
+            yield format_sse("done", {})
+        
+        return StreamingResponse(lookup_events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+    
+    cached = await get_cached_answer(request, body)
+    if cached is not None:
+        async def cached_events():
+            yield format_sse("sources", cached[1])
+            yield format_sse("token", cached[0])
+            yield format_sse("done", {})
+        
+        return StreamingResponse(cached_events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+    
+    results, system_prompt, user_prompt = await prepare_answer(request, body)
+    openai_client = request.app.state.openai_client
+    
+    async def events():
+        yield format_sse("sources", format_sources(results))
+        try:
+            async for token in openai_client.stream_response(prompt=user_prompt, system_prompt=system_prompt):
+                yield format_sse("token", token)
+        except Exception as e:
+            yield format_sse("error", str(e))
+            return
+        yield format_sse("done", {})
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
@@ -0,0 +1,187 @@
+import os
+import re
+import json
+import sqlite3
+import datetime
+import threading
+from typing import Dict, List, Optional
+from chat.batch_answering import answer_questions
+
+# Canonical questions answered ahead of time for every freshly processed document
+DEFAULT_WARMUP_QUESTIONS = {
+    "standard": [
+        "What are the key figures of this year?",
+        "What is the company's strategy?",
+        "What are the main risks?",
+        "What is the outlook for next year?",
+    ],
+    "economist": [
+        "How did revenue and EBITDA develop?",
+        "What is the financial outlook?",
+    ],
+    "corporate_lawyer": [
+        "What are the main legal and regulatory risks?",
+    ],
+    "critical_journalist": [
+        "Which claims in the report lack supporting evidence?",
+    ],
+}
+
+# Excerpts retrieved per warm-up question; cached answers only apply to requests that
+# retrieve the same way
+WARMUP_N_RESULTS = 3
+
+
+def normalize_question(question: str) -> str:
+    """Normalize a question so trivially different phrasings share a cache entry."""
+    question = re.sub(r"[^\w\s]", " ", question.lower())
+    return re.sub(r"\s+", " ", question).strip()
+
+
+def retrieval_matches_warm_up(n_results: int, mmr: bool) -> bool:
+    """Check whether a request retrieves excerpts the way warm_up did, so a cached answer applies."""
+    return n_results == WARMUP_N_RESULTS and not mmr
+
+
+def load_warmup_questions(path: Optional[str] = None) -> Dict[str, List[str]]:
+    """
+    Load the warm-up questions per role.
+
+    Args:
+        path: Optional JSON file mapping roles to lists of questions
+
+    Returns:
+        Dict of role to questions (the defaults if no file is given)
+    """
+    if not path:
+        return DEFAULT_WARMUP_QUESTIONS
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+class AnswerCache:
+    """
+    Persistent SQLite cache of answers keyed by document version, role and normalized question.
+
+    Entries for other document versions are never returned, so re-processing the
+    document invalidates the cache automatically; invalidate() also removes them.
+    """
+
+    def __init__(self, path: str = "./answer_cache.sqlite3"):
+        """
+        Args:
+            path: Path of the SQLite database file
+        """
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS answers (
+                    document_version TEXT NOT NULL,
+                    role TEXT NOT NULL,
+                    question_key TEXT NOT NULL,
+                    question TEXT NOT NULL,
+                    answer TEXT NOT NULL,
+                    source_ids TEXT NOT NULL,
+                    source_distances TEXT NOT NULL,
+                    created TEXT NOT NULL,
+                    PRIMARY KEY (document_version, role, question_key)
+                )
+            """)
+
+    def _connect(self):
+        # A connection per call keeps the cache safe to use from several threads
+        return sqlite3.connect(self.path, timeout=10)
+
+    def get(self, document_version: str, role: str, question: str) -> Optional[Dict]:
+        """
+        Look up a cached answer.
+
+        Returns:
+            Dict with question, answer, source_ids and source_distances, or None
+        """
+        if document_version is None:
+            return None
+
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT question, answer, source_ids, source_distances FROM answers "
+                "WHERE document_version = ? AND role = ? AND question_key = ?",
+                (document_version, role, normalize_question(question))
+            ).fetchone()
+
+        if row is None:
+            return None
+        return {
+            "question": row[0],
+            "answer": row[1],
+            "source_ids": json.loads(row[2]),
+            "source_distances": json.loads(row[3])
+        }
+
+    def put(self, document_version: str, role: str, question: str, answer: str,
+            source_ids: List[str], source_distances: List[float]):
+        """Store an answer, replacing an existing entry for the same key."""
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    document_version,
+                    role,
+                    normalize_question(question),
+                    question,
+                    answer,
+                    json.dumps(source_ids),
+                    json.dumps(source_distances),
+                    datetime.datetime.now().isoformat()
+                )
+            )
+
+    def invalidate(self, keep_version: Optional[str] = None):
+        """Remove all entries that do not belong to the given document version."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM answers WHERE document_version IS NOT ?", (keep_version,))
+
+
+def warm_up(vector_db, openai_client, cache: AnswerCache, questions_by_role: Dict[str, List[str]] = None,
+            max_concurrency: int = 4) -> int:
+    """
+    Answer the canonical questions for every role and store them in the cache.
+
+    Args:
+        vector_db: VectorDatabase holding the freshly processed document
+        openai_client: OpenAIClient used to generate the answers
+        cache: AnswerCache to fill
+        questions_by_role: Dict of role to questions (defaults to DEFAULT_WARMUP_QUESTIONS)
+        max_concurrency: Maximum number of answers generated at the same time
+
+    Returns:
+        Number of answers stored
+    """
+    document_version = vector_db.document_version
+    cache.invalidate(document_version)
+
+    stored = 0
+    for role, questions in (questions_by_role or DEFAULT_WARMUP_QUESTIONS).items():
+        for record in answer_questions(questions, vector_db, openai_client, role=role,
+                                       n_results=WARMUP_N_RESULTS, max_concurrency=max_concurrency):
+            # Skip failed answers, table lookups (already instant) and answers for a
+            # document that was replaced in the meantime
+            if record["error"] or not record["distances"] or vector_db.document_version != document_version:
+                continue
+            cache.put(document_version, role, record["question"], record["answer"],
+                      record["sources"], record["distances"])
+            stored += 1
+    return stored
+
+
+def start_warm_up(vector_db, openai_client, cache: AnswerCache,
+                  questions_by_role: Dict[str, List[str]] = None) -> threading.Thread:
+    """Run warm_up in a background thread so the UI stays responsive."""
+    thread = threading.Thread(
+        target=warm_up,
+        args=(vector_db, openai_client, cache, questions_by_role),
+        daemon=True
+    )
+    thread.start()
+    return thread
@@ -0,0 +1,227 @@
+import argparse
+import csv
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Iterator, List, Dict, Any, Optional
+from prompts.prompts import get_system_prompt, format_user_prompt, format_retrieved_context
+from database.table_index import format_lookup_answer
+
+RESULT_FIELDS = ["index", "question", "answer", "sources", "error"]
+
+# Characters of each source excerpt written to CSV output
+EXCERPT_LENGTH = 300
+
+
+class RateLimiter:
+    """Spaces out request starts so they stay under a requests-per-minute cap."""
+
+    def __init__(self, requests_per_minute: Optional[int] = None):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self.next_slot = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        """Block until the next request is allowed to start."""
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def load_questions(path: str) -> List[str]:
+    """
+    Load questions from a text file (one per line) or a CSV file.
+
+    For CSV files the "question" column is used if present, otherwise the first column.
+
+    Args:
+        path: Path to the question file
+
+    Returns:
+        List of non-empty questions
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        return parse_questions(f.read(), is_csv=path.lower().endswith(".csv"))
+
+
+def parse_questions(text: str, is_csv: bool = False) -> List[str]:
+    """
+    Parse questions from the contents of a question file.
+
+    Args:
+        text: File contents
+        is_csv: Whether the contents are CSV
+
+    Returns:
+        List of non-empty questions
+    """
+    if not is_csv:
+        return [line.strip() for line in text.splitlines() if line.strip()]
+
+    rows = list(csv.reader(text.splitlines()))
+    if not rows:
+        return []
+    header = [column.strip().lower() for column in rows[0]]
+    if "question" in header:
+        column = header.index("question")
+        rows = rows[1:]
+    else:
+        column = 0
+    return [row[column].strip() for row in rows if len(row) > column and row[column].strip()]
+
+
+def answer_questions(questions: List[str], vector_db, openai_client, role: str = "standard",
+                     n_results: int = 3, max_concurrency: int = 8,
+                     requests_per_minute: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Answer a list of questions against the current document.
+
+    Plain metric questions are answered from the table index first. The other
+    questions are retrieved in one batched search, after which their answers are
+    generated concurrently. Results are yielded as soon as each answer is ready.
+
+    Args:
+        questions: List of questions
+        vector_db: VectorDatabase holding the processed document
+        openai_client: OpenAIClient used to generate the answers
+        role: The role to use for answering
+        n_results: Number of excerpts to retrieve per question
+        max_concurrency: Maximum number of answers generated at the same time
+        requests_per_minute: Optional cap on completion requests per minute
+
+    Returns:
+        A generator that yields one result dict per question, in completion order,
+        with the source chunk IDs and their pages and excerpts
+    """
+    facts = [vector_db.lookup_metric(question) for question in questions]
+    for i, (question, fact) in enumerate(zip(questions, facts)):
+        if fact is not None:
+            yield {
+                "index": i,
+                "question": question,
+                "answer": format_lookup_answer(fact),
+                "sources": [f"table:page_{fact['page']}"],
+                "pages": [fact["page"]],
+                "excerpts": [fact["table"]],
+                "distances": [],
+                "error": ""
+            }
+    
+    remaining = [i for i, fact in enumerate(facts) if fact is None]
+    all_results = vector_db.search_many([questions[i] for i in remaining], n_results=n_results)
+    system_prompt = get_system_prompt(role)
+    rate_limiter = RateLimiter(requests_per_minute)
+
+    def answer(index, question, results):
+        record = {
+            "index": index,
+            "question": question,
+            "answer": "",
+            "sources": results["ids"][0],
+            "pages": [metadata.get("page") for metadata in results["metadatas"][0]],
+            "excerpts": results["documents"][0],
+            "distances": results["distances"][0],
+            "error": ""
+        }
+        if not results["documents"] or not results["documents"][0]:
+            record["answer"] = "No relevant information found in the document."
+            return record
+
+        user_prompt = format_user_prompt(question, format_retrieved_context(results), role)
+        rate_limiter.wait()
+        try:
+            record["answer"] = openai_client.get_response(prompt=user_prompt, system_prompt=system_prompt)
+        except Exception as e:
+            record["error"] = str(e)
+        return record
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        futures = [
+            executor.submit(answer, i, questions[i], results)
+            for i, results in zip(remaining, all_results)
+        ]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def format_sources(record: Dict[str, Any]) -> str:
+    """Format the sources of a record as readable citations with page numbers and excerpts."""
+    citations = []
+    for source_id, page, excerpt in zip(record["sources"], record["pages"], record["excerpts"]):
+        if len(excerpt) > EXCERPT_LENGTH:
+            excerpt = excerpt[:EXCERPT_LENGTH] + "..."
+        location = f"{source_id}, p. {page}" if page is not None else source_id
+        citations.append(f"[{location}] {excerpt}")
+    return "\n\n".join(citations)
+
+
+class ResultWriter:
+    """Writes answer records to a CSV or JSONL file as they arrive."""
+
+    def __init__(self, file, output_format: str = "jsonl"):
+        """
+        Args:
+            file: A writable text file object
+            output_format: Either "csv" or "jsonl"
+        """
+        if output_format not in ("csv", "jsonl"):
+            raise ValueError(f"Unsupported output format: {output_format}")
+
+        self.file = file
+        self.output_format = output_format
+        if output_format == "csv":
+            self.csv_writer = csv.DictWriter(file, fieldnames=RESULT_FIELDS, extrasaction="ignore")
+            self.csv_writer.writeheader()
+
+    def write(self, record: Dict[str, Any]):
+        """Write a single record and flush it to the file."""
+        if self.output_format == "csv":
+            row = dict(record)
+            row["sources"] = format_sources(record)
+            self.csv_writer.writerow(row)
+        else:
+            self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.file.flush()
+
+
+# Usage (from the repository root): PYTHONPATH=src python -m chat.batch_answering questions.txt answers.csv --role economist
+if __name__ == "__main__":
+    from database.vector_store import VectorDatabase
+    from chat.openai_client import OpenAIClient
+
+    parser = argparse.ArgumentParser(description="Answer a file of questions about the processed document.")
+    parser.add_argument("questions", help="Text file with one question per line, or a CSV file")
+    parser.add_argument("output", help="Output file ending in .csv or .jsonl")
+    parser.add_argument("--pdf", help="Process this PDF before answering")
+    parser.add_argument("--role", default="standard")
+    parser.add_argument("--collection", default="streamlit_pdf_db")
+    parser.add_argument("--persist-directory", default="./streamlit_chroma_db")
+    parser.add_argument("--max-concurrency", type=int, default=8)
+    parser.add_argument("--requests-per-minute", type=int, default=None)
+    args = parser.parse_args()
+
+    vector_db = VectorDatabase(collection_name=args.collection, persist_directory=args.persist_directory)
+    if args.pdf:
+        vector_db.process_pdf(args.pdf)
+
+    questions = load_questions(args.questions)
+    output_format = "csv" if args.output.lower().endswith(".csv") else "jsonl"
+
+    with open(args.output, "w", newline="", encoding="utf-8") as f:
+        writer = ResultWriter(f, output_format)
+        for done, record in enumerate(answer_questions(
+            questions,
+            vector_db,
+            OpenAIClient(),
+            role=args.role,
+            max_concurrency=args.max_concurrency,
+            requests_per_minute=args.requests_per_minute
+        ), start=1):
+            writer.write(record)
+            print(f"[{done}/{len(questions)}] {record['question']}")
@@ -1,10 +1,17 @@
 import datetime
 from typing import List, Dict, Any, Optional
+from prompts.prompts import format_user_prompt
 
 class ConversationHandler:
-    def __init__(self, max_history=5):
+    def __init__(self, max_history=5, trim_size=3):
+        """
+        Args:
+            max_history: Maximum number of exchanges kept in the history
+            trim_size: Number of oldest exchanges dropped at once when the history is full
+        """
         self.history = []
         self.max_history = max_history
+        self.trim_size = max(1, min(trim_size, max_history))
         
     def add_exchange(self, user_query, assistant_response, context_used=None):
         """
@@ -22,9 +29,10 @@ class ConversationHandler:
             "timestamp": datetime.datetime.now().isoformat()
         })
         
-        # Trim history if needed
+        # Trim history in blocks: the history (and so the prompt prefix) is only rewritten
+        # once every trim_size turns and otherwise just grows at the end
         if len(self.history) > self.max_history:
-            self.history = self.history[-self.max_history:]
+            self.history = self.history[max(self.trim_size, len(self.history) - self.max_history):]
             
     def get_conversation_context(self):
         """
@@ -47,6 +55,9 @@ class ConversationHandler:
         """
         Format a prompt that includes conversation history.
         
+        The earlier turns come before the retrieved context and the question, so
+        the prompt prefix stays the same from one turn to the next.
+        
         Args:
             current_query: The current user query
             retrieved_context: The retrieved document context
@@ -54,26 +65,7 @@ class ConversationHandler:
         Returns:
             Prompt with conversation history
         """
-        conversation_context = self.get_conversation_context()
-        
-        prompt = f"""I have a question about a document: {current_query}
-
-Here are the most relevant excerpts from the document:
-
-{retrieved_context}
-
-"""
-        
-        if conversation_context:
-            prompt += f"""
-For reference, here is our previous conversation:
-{conversation_context}
-"""
-            
-        prompt += """
-Based on the document excerpts and our conversation history (if relevant), please answer my current question."""
-        
-        return prompt
+        return format_user_prompt(current_query, retrieved_context, conversation=self.get_conversation_context())
         
     def detect_follow_up_question(self, query):
         """
@@ -0,0 +1,98 @@
+import os
+import gzip
+import json
+import datetime
+from typing import Iterator, List, Dict, Any
+
+
+class ConversationStore:
+    """
+    Append-only, gzip-compressed JSONL storage for conversations.
+
+    Every save appends only the new messages as a separate gzip member, so save
+    time and disk usage grow with the new turns rather than the whole session.
+    Retrieved excerpts are stored as chunk IDs instead of copies of their text.
+    """
+
+    def __init__(self, directory: str = "./conversations"):
+        """
+        Args:
+            directory: Directory holding one file per conversation session
+        """
+        self.directory = directory
+
+    def session_path(self, session_id: str) -> str:
+        return os.path.join(self.directory, f"{session_id}.jsonl.gz")
+
+    def append_messages(self, session_id: str, messages: List[Dict[str, Any]], pdf_name: str = None,
+                        document_version: str = None):
+        """
+        Append chat messages to a session.
+
+        Args:
+            session_id: ID of the conversation session
+            messages: Chat messages with "role" and "content"; assistant content may be a
+                dict with "answer" (or "perspectives"), "source_ids", "source_distances"
+                and the "document_version" the chunk IDs belong to
+            pdf_name: Name of the document the conversation is about
+            document_version: Version of that document, see VectorDatabase.document_version
+        """
+        if not messages:
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.session_path(session_id)
+
+        records = []
+        if not os.path.exists(path):
+            records.append({
+                "type": "session",
+                "session_id": session_id,
+                "pdf_name": pdf_name,
+                "document_version": document_version,
+                "created": datetime.datetime.now().isoformat()
+            })
+        for message in messages:
+            record = {"type": "message", "role": message["role"]}
+            content = message["content"]
+            if isinstance(content, dict):
+                if "perspectives" in content:
+                    record["perspectives"] = content["perspectives"]
+                else:
+                    record["answer"] = content.get("answer", "")
+                record["sources"] = [
+                    {"id": source_id, "distance": distance}
+                    for source_id, distance in zip(content.get("source_ids", []), content.get("source_distances", []))
+                ]
+                record["document_version"] = content.get("document_version", document_version)
+            else:
+                record["content"] = content
+            records.append(record)
+
+        with gzip.open(path, "at", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def iter_records(self, session_id: str) -> Iterator[Dict[str, Any]]:
+        """
+        Stream the records of a session without reading the whole file into memory.
+
+        Args:
+            session_id: ID of the conversation session
+
+        Returns:
+            A generator that yields the session header followed by the messages
+        """
+        with gzip.open(self.session_path(session_id), "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def list_sessions(self) -> List[str]:
+        """List stored session IDs, most recently updated first."""
+        if not os.path.isdir(self.directory):
+            return []
+
+        files = [name for name in os.listdir(self.directory) if name.endswith(".jsonl.gz")]
+        files.sort(key=lambda name: os.path.getmtime(os.path.join(self.directory, name)), reverse=True)
+        return [name[:-len(".jsonl.gz")] for name in files]
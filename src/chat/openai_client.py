@@ -1,13 +1,36 @@
 import os
-from typing import List, Optional
-from openai import OpenAI
+from typing import List, Optional, AsyncIterator
+import httpx
+from openai import OpenAI, AsyncOpenAI
 from dotenv import load_dotenv, find_dotenv
 import base64
+from chat.singleflight import singleflight, async_singleflight, make_key
+
+def summarize_usage(usage) -> dict:
+    """
+    Extract token counts from an API usage object.
+    
+    Args:
+        usage: The usage object of a chat completion
+        
+    Returns:
+        Dict with prompt, cached and completion token counts
+    """
+    if usage is None:
+        return {}
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "prompt_tokens": usage.prompt_tokens,
+        "cached_tokens": (getattr(details, "cached_tokens", None) or 0) if details else 0,
+        "completion_tokens": usage.completion_tokens
+    }
+
 
 class OpenAIClient:
     """A simple client for getting responses from OpenAI's chat models."""
     
-    def __init__(self, api_key: Optional[str] = None, model: str = "gpt-4o-mini", embedding_model="text-embedding-3-small"):
+    def __init__(self, api_key: Optional[str] = None, model: str = "gpt-4o-mini", embedding_model="text-embedding-3-small",
+                 coalesce_requests: bool = True):
         # Load environment variables from .env file
         load_dotenv(find_dotenv())
         
@@ -18,6 +41,10 @@ class OpenAIClient:
         self.client = OpenAI(api_key=self.api_key)
         self.model = model
         self.embedding_model = embedding_model
+        # Share identical in-flight requests with other sessions in this process
+        self.coalesce_requests = coalesce_requests
+        # Token usage of the most recent get_response call
+        self.last_usage = {}
         
     def get_response(self, prompt: str, system_prompt: str = "You are a helpful assistant.") -> str:
         """
@@ -30,7 +57,7 @@ class OpenAIClient:
         Returns:
             The model's response as a string
         """
-        try:
+        def request():
             completion = self.client.chat.completions.create(
                 model=self.model,
                 messages=[
@@ -38,7 +65,14 @@ class OpenAIClient:
                     {"role": "user", "content": prompt}
                 ]
             )
-            return completion.choices[0].message.content
+            return completion.choices[0].message.content, summarize_usage(completion.usage)
+        
+        try:
+            if self.coalesce_requests:
+                content, self.last_usage = singleflight.do(make_key("chat", self.model, system_prompt, prompt), request)
+            else:
+                content, self.last_usage = request()
+            return content
             
         except Exception as e:
             raise Exception(f"Error getting response from OpenAI: {str(e)}")
@@ -54,7 +88,7 @@ class OpenAIClient:
         Returns:
             A generator that yields response chunks
         """
-        try:
+        def request():
             stream = self.client.chat.completions.create(
                 model=self.model,
                 messages=[
@@ -65,8 +99,17 @@ class OpenAIClient:
             )
             
             for chunk in stream:
-                if chunk.choices[0].delta.content is not None:
+                if chunk.choices and chunk.choices[0].delta.content is not None:
                     yield chunk.choices[0].delta.content
+        
+        try:
+            if self.coalesce_requests:
+                chunks = singleflight.stream(make_key("chat_stream", self.model, system_prompt, prompt), request)
+            else:
+                chunks = request()
+            
+            for chunk in chunks:
+                yield chunk
                     
         except Exception as e:
             raise Exception(f"Error streaming response from OpenAI: {str(e)}")
@@ -81,12 +124,17 @@ class OpenAIClient:
         Returns:
             List of floats representing the embedding
         """
-        try:
+        def request():
             response = self.client.embeddings.create(
                 model=self.embedding_model,
                 input=text
             )
             return response.data[0].embedding
+        
+        try:
+            if self.coalesce_requests:
+                return singleflight.do(make_key("embedding", self.embedding_model, text), request)
+            return request()
             
         except Exception as e:
             raise Exception(f"Error generating embedding: {str(e)}")
@@ -101,12 +149,17 @@ class OpenAIClient:
         Returns:
             List of embeddings, where each embedding is a list of floats
         """
-        try:
+        def request():
             response = self.client.embeddings.create(
                 model=self.embedding_model,
                 input=texts
             )
             return [data.embedding for data in response.data]
+        
+        try:
+            if self.coalesce_requests:
+                return singleflight.do(make_key("embeddings", self.embedding_model, texts), request)
+            return request()
             
         except Exception as e:
             raise Exception(f"Error generating embeddings: {str(e)}")
@@ -182,6 +235,140 @@ class OpenAIClient:
             raise Exception(f"Error getting image response from OpenAI: {str(e)}")
 
 
+class AsyncOpenAIClient:
+    """An async client for OpenAI's chat and embedding models that shares one connection pool."""
+    
+    def __init__(self, api_key: Optional[str] = None, model: str = "gpt-4o-mini",
+                 embedding_model="text-embedding-3-small", max_connections: int = 100,
+                 coalesce_requests: bool = True):
+        # Load environment variables from .env file
+        load_dotenv(find_dotenv())
+        
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        if not self.api_key:
+            raise ValueError("API key must be provided either directly or via OPENAI_API_KEY environment variable")
+        
+        # One pooled HTTP client for every request made through this instance
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=httpx.Timeout(60.0, connect=5.0)
+        )
+        self.client = AsyncOpenAI(api_key=self.api_key, http_client=self.http_client)
+        self.model = model
+        self.embedding_model = embedding_model
+        # Share identical in-flight requests with other callers in this worker
+        self.coalesce_requests = coalesce_requests
+    
+    async def get_response(self, prompt: str, system_prompt: str = "You are a helpful assistant.") -> str:
+        """
+        Get a response from the model using a simple prompt.
+        
+        Args:
+            prompt: The user's question or prompt
+            system_prompt: Optional system prompt to set the AI's behavior
+            
+        Returns:
+            The model's response as a string
+        """
+        content, _ = await self.get_response_with_usage(prompt, system_prompt)
+        return content
+    
+    async def get_response_with_usage(self, prompt: str, system_prompt: str = "You are a helpful assistant."):
+        """
+        Get a response from the model together with its token usage.
+        
+        Args:
+            prompt: The user's question or prompt
+            system_prompt: Optional system prompt to set the AI's behavior
+            
+        Returns:
+            Tuple of (response, usage dict with prompt, cached and completion tokens)
+        """
+        async def request():
+            completion = await self.client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": prompt}
+                ]
+            )
+            return completion.choices[0].message.content, summarize_usage(completion.usage)
+        
+        try:
+            if self.coalesce_requests:
+                return await async_singleflight.do(make_key("chat", self.model, system_prompt, prompt), request)
+            return await request()
+            
+        except Exception as e:
+            raise Exception(f"Error getting response from OpenAI: {str(e)}")
+    
+    async def stream_response(self, prompt: str, system_prompt: str = "You are a helpful assistant.") -> AsyncIterator[str]:
+        """
+        Stream a response from the model using a simple prompt.
+        
+        Args:
+            prompt: The user's question or prompt
+            system_prompt: Optional system prompt to set the AI's behavior
+            
+        Returns:
+            An async generator that yields response chunks
+        """
+        async def request():
+            stream = await self.client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": prompt}
+                ],
+                stream=True
+            )
+            
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content is not None:
+                    yield chunk.choices[0].delta.content
+        
+        try:
+            if self.coalesce_requests:
+                chunks = async_singleflight.stream(make_key("chat_stream", self.model, system_prompt, prompt), request)
+            else:
+                chunks = request()
+            
+            async for chunk in chunks:
+                yield chunk
+                    
+        except Exception as e:
+            raise Exception(f"Error streaming response from OpenAI: {str(e)}")
+    
+    async def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """
+        Generate embeddings for multiple texts.
+        
+        Args:
+            texts: List of texts to generate embeddings for
+            
+        Returns:
+            List of embeddings, where each embedding is a list of floats
+        """
+        async def request():
+            response = await self.client.embeddings.create(
+                model=self.embedding_model,
+                input=texts
+            )
+            return [data.embedding for data in response.data]
+        
+        try:
+            if self.coalesce_requests:
+                return await async_singleflight.do(make_key("embeddings", self.embedding_model, texts), request)
+            return await request()
+            
+        except Exception as e:
+            raise Exception(f"Error generating embeddings: {str(e)}")
+    
+    async def close(self):
+        """Close the pooled HTTP connections."""
+        await self.http_client.aclose()
+
+
 # Example usage:
 if __name__ == "__main__":
     client = OpenAIClient()
@@ -0,0 +1,41 @@
+import queue
+import threading
+from typing import Dict, Iterator, Tuple
+
+
+def stream_perspectives(openai_client, system_prompt: str, user_prompts: Dict[str, str]) -> Iterator[Tuple[str, str, str]]:
+    """
+    Stream answers for several perspectives concurrently.
+
+    Every perspective is generated on its own thread; their chunks are merged into
+    one stream so the caller (e.g. the Streamlit script thread) can render them as
+    they arrive. The total time is roughly that of the slowest single answer.
+
+    Args:
+        openai_client: OpenAIClient used to generate the answers
+        system_prompt: System prompt shared by all perspectives
+        user_prompts: Dict of role to user prompt
+
+    Returns:
+        A generator of (role, event, payload) tuples, where event is "token",
+        "error" or "done"
+    """
+    events = queue.Queue()
+
+    def generate(role, prompt):
+        try:
+            for chunk in openai_client.stream_response(prompt=prompt, system_prompt=system_prompt):
+                events.put((role, "token", chunk))
+        except Exception as e:
+            events.put((role, "error", str(e)))
+        events.put((role, "done", ""))
+
+    for role, prompt in user_prompts.items():
+        threading.Thread(target=generate, args=(role, prompt), daemon=True).start()
+
+    remaining = len(user_prompts)
+    while remaining:
+        event = events.get()
+        if event[1] == "done":
+            remaining -= 1
+        yield event
@@ -0,0 +1,235 @@
+import asyncio
+import hashlib
+import json
+import threading
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator
+
+
+def make_key(*parts) -> str:
+    """
+    Build a coalescing key from the content of a request.
+
+    Args:
+        parts: JSON-serializable parts that identify the request (kind, model, prompts, ...)
+
+    Returns:
+        A hex digest that is identical for byte-identical requests
+    """
+    payload = json.dumps(parts, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _StreamCall:
+    """Buffers the chunks of one upstream stream so every subscriber sees all of them."""
+
+    def __init__(self):
+        self.chunks = []
+        self.finished = False
+        self.error = None
+        self.condition = threading.Condition()
+
+    def run(self, fn: Callable[[], Iterator[Any]], on_finish: Callable[[], None]):
+        try:
+            for chunk in fn():
+                with self.condition:
+                    self.chunks.append(chunk)
+                    self.condition.notify_all()
+        except Exception as e:
+            self.error = e
+        finally:
+            on_finish()
+            with self.condition:
+                self.finished = True
+                self.condition.notify_all()
+
+    def subscribe(self) -> Iterator[Any]:
+        position = 0
+        while True:
+            with self.condition:
+                while position >= len(self.chunks) and not self.finished:
+                    self.condition.wait()
+                if position < len(self.chunks):
+                    chunk = self.chunks[position]
+                    position += 1
+                elif self.error is not None:
+                    raise self.error
+                else:
+                    return
+            yield chunk
+
+
+class SingleFlight:
+    """
+    Coalesces identical in-flight calls across threads.
+
+    The first caller for a key performs the upstream request; callers that arrive
+    while it is still running wait for it and receive the same result. Nothing is
+    cached once the call has finished.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls: Dict[str, _Call] = {}
+        self.streams: Dict[str, _StreamCall] = {}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """
+        Run fn once for all concurrent callers with the same key.
+
+        Args:
+            key: Coalescing key, see make_key
+            fn: Function performing the upstream request
+
+        Returns:
+            The result of fn (exceptions are re-raised for every caller)
+        """
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                self.calls.pop(key, None)
+            call.done.set()
+
+    def stream(self, key: str, fn: Callable[[], Iterator[Any]]) -> Iterator[Any]:
+        """
+        Share one upstream stream between all concurrent callers with the same key.
+
+        The upstream generator is consumed by a background thread, so a slow or
+        abandoned subscriber does not hold up the others. Subscribers that join
+        late first receive the chunks that were already produced.
+
+        Args:
+            key: Coalescing key, see make_key
+            fn: Function returning the upstream generator
+
+        Returns:
+            A generator that yields every chunk of the shared stream
+        """
+        with self.lock:
+            call = self.streams.get(key)
+            if call is None:
+                call = self.streams[key] = _StreamCall()
+                threading.Thread(
+                    target=call.run,
+                    args=(fn, lambda: self._finish_stream(key, call)),
+                    daemon=True
+                ).start()
+        return call.subscribe()
+
+    def _finish_stream(self, key, call):
+        with self.lock:
+            if self.streams.get(key) is call:
+                del self.streams[key]
+
+
+class _AsyncStreamCall:
+    def __init__(self):
+        self.chunks = []
+        self.finished = False
+        self.error = None
+        self.condition = asyncio.Condition()
+        self.task = None
+
+    async def run(self, fn: Callable[[], AsyncIterator[Any]], on_finish: Callable[[], None]):
+        try:
+            async for chunk in fn():
+                async with self.condition:
+                    self.chunks.append(chunk)
+                    self.condition.notify_all()
+        except Exception as e:
+            self.error = e
+        finally:
+            on_finish()
+            async with self.condition:
+                self.finished = True
+                self.condition.notify_all()
+
+    async def subscribe(self) -> AsyncIterator[Any]:
+        position = 0
+        while True:
+            async with self.condition:
+                await self.condition.wait_for(lambda: position < len(self.chunks) or self.finished)
+                if position < len(self.chunks):
+                    chunk = self.chunks[position]
+                    position += 1
+                elif self.error is not None:
+                    raise self.error
+                else:
+                    return
+            yield chunk
+
+
+class AsyncSingleFlight:
+    """The asyncio counterpart of SingleFlight, for use within one event loop."""
+
+    def __init__(self):
+        self.calls: Dict[str, asyncio.Task] = {}
+        self.streams: Dict[str, _AsyncStreamCall] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Await fn once for all concurrent callers with the same key.
+
+        Args:
+            key: Coalescing key, see make_key
+            fn: Coroutine function performing the upstream request
+
+        Returns:
+            The result of fn (exceptions are re-raised for every caller)
+        """
+        task = self.calls.get(key)
+        if task is None:
+            task = self.calls[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda done: self._forget(self.calls, key, done))
+        # Shield the shared task so one cancelled caller does not cancel the others
+        return await asyncio.shield(task)
+
+    def stream(self, key: str, fn: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+        """
+        Share one upstream async stream between all concurrent callers with the same key.
+
+        Args:
+            key: Coalescing key, see make_key
+            fn: Function returning the upstream async generator
+
+        Returns:
+            An async generator that yields every chunk of the shared stream
+        """
+        call = self.streams.get(key)
+        if call is None:
+            call = self.streams[key] = _AsyncStreamCall()
+            call.task = asyncio.ensure_future(call.run(fn, lambda: self._forget(self.streams, key, call)))
+        return call.subscribe()
+
+    @staticmethod
+    def _forget(registry, key, value):
+        if registry.get(key) is value:
+            del registry[key]
+
+
+# Process-wide groups shared by every client instance
+singleflight = SingleFlight()
+async_singleflight = AsyncSingleFlight()
@@ -0,0 +1,48 @@
+import numpy as np
+from typing import List
+
+
+def maximal_marginal_relevance(query_embedding, candidate_embeddings, k: int = 3,
+                               lambda_mult: float = 0.5) -> List[int]:
+    """
+    Select candidates that are relevant to the query but not redundant with each other.
+
+    All similarities are computed up front as matrix products; each selection step is
+    then a handful of vector operations over the candidates.
+
+    Args:
+        query_embedding: The query embedding
+        candidate_embeddings: Array-like of shape (n, d) with the candidate embeddings
+        k: Number of candidates to select
+        lambda_mult: 1.0 ranks purely on relevance, 0.0 purely on diversity
+
+    Returns:
+        Indices of the selected candidates, in selection order
+    """
+    candidates = np.asarray(candidate_embeddings, dtype=np.float32)
+    if candidates.ndim != 2 or len(candidates) == 0:
+        return []
+
+    query = np.asarray(query_embedding, dtype=np.float32)
+    candidates = candidates / np.maximum(np.linalg.norm(candidates, axis=1, keepdims=True), 1e-12)
+    query = query / max(np.linalg.norm(query), 1e-12)
+
+    relevance = candidates @ query
+    similarity = candidates @ candidates.T
+
+    k = min(k, len(candidates))
+    selected = [int(np.argmax(relevance))]
+    # Highest similarity of every candidate to anything already selected
+    redundancy = similarity[selected[0]].copy()
+    available = np.ones(len(candidates), dtype=bool)
+    available[selected[0]] = False
+
+    while len(selected) < k:
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(redundancy, similarity[best], out=redundancy)
+
+    return selected
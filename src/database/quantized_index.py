@@ -0,0 +1,269 @@
+import os
+import numpy as np
+from typing import List, Optional, Tuple
+
+STORAGE_MODES = ("float32", "int8", "binary")
+
+# Rows quantized at a time, so building the codes never loads all full-precision vectors
+BLOCK_ROWS = 4096
+
+# Number of set bits for every possible byte value, used for Hamming distances
+_POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1)
+
+
+def normalize_embeddings(embeddings, dimensions: Optional[int] = None):
+    """
+    Truncate embeddings to the requested dimensions and re-normalize them.
+
+    text-embedding-3 models are trained so that the leading dimensions carry most
+    of the information, so truncating and re-normalizing gives the same result as
+    requesting shortened embeddings from the API.
+
+    Args:
+        embeddings: Array-like of shape (n, d)
+        dimensions: Optional number of leading dimensions to keep
+
+    Returns:
+        float32 array of unit-length vectors
+    """
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    if dimensions is not None:
+        vectors = vectors[:, :dimensions]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class QuantizedIndex:
+    """
+    A compact in-memory index over quantized embeddings.
+
+    Search runs a fast first pass over int8 or binary codes and then rescores a
+    shortlist against the full-precision vectors, which are kept in a memory-mapped
+    file so only the shortlisted rows are read from disk.
+
+    A persisted index can be built incrementally with start(), add() per batch and
+    finish(), so only one batch of full-precision vectors is in memory at a time.
+    """
+
+    def __init__(self, mode: str = "int8", index_path: Optional[str] = None):
+        """
+        Args:
+            mode: One of "float32", "int8" or "binary"
+            index_path: Optional path prefix for persisting the index
+        """
+        if mode not in STORAGE_MODES:
+            raise ValueError(f"Unknown storage mode '{mode}', expected one of {STORAGE_MODES}")
+
+        self.mode = mode
+        self.index_path = index_path
+        self.ids: List[str] = []
+        self.dimensions = None
+        self.codes = None
+        self.scale = None
+        self.full_vectors = None
+
+    @property
+    def codes_file(self):
+        return f"{self.index_path}_{self.mode}.npz"
+
+    @property
+    def vectors_file(self):
+        # Raw float32 rows, so batches can be appended without rewriting the file
+        return f"{self.index_path}_full.f32"
+
+    def build(self, ids: List[str], embeddings):
+        """
+        Quantize the embeddings and (if an index path is set) persist them.
+
+        Args:
+            ids: Chunk IDs in the same order as the embeddings
+            embeddings: Array-like of shape (n, d)
+        """
+        if self.index_path is not None:
+            self.start()
+            self.add(ids, embeddings)
+            self.finish()
+            return
+
+        vectors = normalize_embeddings(embeddings)
+        self.ids = list(ids)
+        self.dimensions = vectors.shape[1]
+        self.full_vectors = vectors
+        self.codes, self.scale = self._quantize(vectors)
+
+    def start(self):
+        """Start an incremental build, replacing a previously persisted index."""
+        if self.index_path is None:
+            raise ValueError("An incremental build needs an index_path")
+        self.delete()
+        os.makedirs(os.path.dirname(os.path.abspath(self.vectors_file)), exist_ok=True)
+        open(self.vectors_file, "wb").close()
+
+    def add(self, ids: List[str], embeddings):
+        """
+        Append a batch of embeddings to the full-precision vectors on disk.
+
+        Args:
+            ids: Chunk IDs in the same order as the embeddings
+            embeddings: Array-like of shape (n, d)
+        """
+        vectors = normalize_embeddings(embeddings)
+        self.dimensions = vectors.shape[1]
+        self.ids.extend(ids)
+        with open(self.vectors_file, "ab") as f:
+            vectors.tofile(f)
+
+    def finish(self):
+        """Quantize the appended vectors block by block and persist the codes."""
+        if not self.ids:
+            return
+        self.full_vectors = self._open_vectors()
+        self.codes, self.scale = self._quantize(self.full_vectors)
+        np.savez(
+            self.codes_file,
+            ids=np.array(self.ids),
+            dimensions=np.array(self.dimensions),
+            codes=self.codes,
+            scale=self.scale if self.scale is not None else np.array([])
+        )
+
+    def _open_vectors(self):
+        return np.memmap(self.vectors_file, dtype=np.float32, mode="r", shape=(len(self.ids), self.dimensions))
+
+    def _quantize(self, vectors):
+        """
+        Quantize unit-length vectors, reading them in blocks of BLOCK_ROWS rows.
+
+        Returns:
+            Tuple of (codes, per-dimension int8 scale or None)
+        """
+        n, d = vectors.shape
+        if self.mode == "int8":
+            # Symmetric per-dimension scaling into the int8 range
+            scale = np.zeros(d, dtype=np.float32)
+            for start in range(0, n, BLOCK_ROWS):
+                np.maximum(scale, np.abs(vectors[start:start + BLOCK_ROWS]).max(axis=0), out=scale)
+            scale /= 127.0
+            scale[scale == 0] = 1.0
+            codes = np.empty((n, d), dtype=np.int8)
+            for start in range(0, n, BLOCK_ROWS):
+                codes[start:start + BLOCK_ROWS] = np.round(vectors[start:start + BLOCK_ROWS] / scale)
+            return codes, scale
+        if self.mode == "binary":
+            codes = np.empty((n, (d + 7) // 8), dtype=np.uint8)
+            for start in range(0, n, BLOCK_ROWS):
+                codes[start:start + BLOCK_ROWS] = np.packbits(vectors[start:start + BLOCK_ROWS] > 0, axis=1)
+            return codes, None
+        return np.asarray(vectors), None
+
+    def load(self):
+        """
+        Load a persisted index.
+
+        Returns:
+            True if the index was found on disk, False otherwise
+        """
+        if self.index_path is None or not os.path.exists(self.codes_file):
+            return False
+
+        data = np.load(self.codes_file)
+        self.ids = data["ids"].tolist()
+        self.dimensions = int(data["dimensions"])
+        self.codes = data["codes"]
+        self.scale = data["scale"] if data["scale"].size else None
+        self.full_vectors = self._open_vectors()
+        return True
+
+    def delete(self):
+        """Remove the persisted index files."""
+        for path in (self.codes_file, self.vectors_file):
+            if self.index_path is not None and os.path.exists(path):
+                os.remove(path)
+        self.ids = []
+        self.dimensions = None
+        self.codes = None
+        self.scale = None
+        self.full_vectors = None
+
+    def memory_bytes(self):
+        """Bytes held in memory by the first-pass codes."""
+        if self.codes is None:
+            return 0
+        return self.codes.nbytes + (self.scale.nbytes if self.scale is not None else 0)
+
+    def storage_bytes(self):
+        """Bytes stored for the index, including the full-precision vectors used for rescoring."""
+        if self.codes is None:
+            return 0
+        if self.mode == "float32":
+            return self.memory_bytes()
+        return self.memory_bytes() + self.full_vectors.nbytes
+
+    def get_vectors(self, ids: List[str]):
+        """
+        Get the full-precision vectors for the given IDs.
+
+        Args:
+            ids: Chunk IDs to look up
+
+        Returns:
+            float32 array with one row per ID
+        """
+        positions = {chunk_id: i for i, chunk_id in enumerate(self.ids)}
+        return np.asarray(self.full_vectors[[positions[chunk_id] for chunk_id in ids]])
+
+    def _first_pass_scores(self, query):
+        if self.mode == "float32":
+            return self.codes @ query
+
+        # Score in blocks of BLOCK_ROWS, so the temporary widened codes stay small
+        scores = np.empty(len(self.codes), dtype=np.float32)
+        if self.mode == "int8":
+            scaled_query = query * self.scale
+            for start in range(0, len(self.codes), BLOCK_ROWS):
+                block = self.codes[start:start + BLOCK_ROWS]
+                scores[start:start + BLOCK_ROWS] = block.astype(np.float32) @ scaled_query
+        else:
+            query_bits = np.packbits(query > 0)
+            for start in range(0, len(self.codes), BLOCK_ROWS):
+                block = self.codes[start:start + BLOCK_ROWS]
+                # Fewer differing bits means more similar, so negate the Hamming distance
+                scores[start:start + BLOCK_ROWS] = -_POPCOUNT[np.bitwise_xor(block, query_bits)].sum(axis=1).astype(np.float32)
+        return scores
+
+    def search(self, query_embedding, n_results: int = 3,
+               rescore_multiplier: int = 4) -> Tuple[List[str], List[float]]:
+        """
+        Find the chunks closest to the query embedding.
+
+        Args:
+            query_embedding: The query embedding (same dimensions as the index)
+            n_results: Number of results to return
+            rescore_multiplier: Shortlist size as a multiple of n_results
+
+        Returns:
+            Tuple of (ids, distances), with squared L2 distances like Chroma's default
+        """
+        if self.codes is None or not self.ids:
+            return [], []
+
+        query = normalize_embeddings(query_embedding)[0]
+        n_results = min(n_results, len(self.ids))
+
+        scores = self._first_pass_scores(query)
+        if self.mode == "float32":
+            shortlist = np.arange(len(self.ids))
+        else:
+            shortlist_size = min(len(self.ids), n_results * max(rescore_multiplier, 1))
+            shortlist = np.argpartition(-scores, shortlist_size - 1)[:shortlist_size]
+            shortlist.sort()
+            # Rescore the shortlist at full precision
+            scores = np.asarray(self.full_vectors[shortlist]) @ query
+
+        top = np.argsort(-scores)[:n_results]
+        ids = [self.ids[i] for i in shortlist[top]]
+        distances = (2.0 - 2.0 * scores[top]).tolist()
+        return ids, distances
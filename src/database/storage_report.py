@@ -0,0 +1,109 @@
+import sys
+import numpy as np
+from langchain_text_splitters import MarkdownTextSplitter
+from chat.openai_client import OpenAIClient
+from database.quantized_index import QuantizedIndex, normalize_embeddings
+from document_processing.pdf_handler import PDFHandler
+
+# Fixed question set used to compare storage modes
+DEFAULT_QUESTIONS = [
+    "What was the total revenue this year?",
+    "How did EBITDA develop compared to last year?",
+    "What is the dividend per share?",
+    "How many employees does the company have?",
+    "What are the main strategic priorities?",
+    "What are the most important risks the company faces?",
+    "How much was invested in the network?",
+    "What are the sustainability targets?",
+    "Who are the members of the board of management?",
+    "What is the outlook for next year?",
+]
+
+# (embedding dimensions, storage mode) combinations to compare
+DEFAULT_CONFIGS = [
+    (1536, "float32"),
+    (1536, "int8"),
+    (1536, "binary"),
+    (512, "float32"),
+    (512, "int8"),
+    (512, "binary"),
+    (256, "int8"),
+]
+
+
+def compare_storage_modes(chunk_embeddings, question_embeddings, configs=DEFAULT_CONFIGS,
+                          n_results=3, rescore_multiplier=4):
+    """
+    Compare recall and memory footprint of storage configurations.
+
+    Recall is measured against exact full-dimension float32 search, so the report
+    only needs one set of full-size embeddings from the API.
+
+    Args:
+        chunk_embeddings: Full-dimension embeddings of the document chunks
+        question_embeddings: Full-dimension embeddings of the questions
+        configs: List of (dimensions, storage mode) tuples
+        n_results: Number of results per question
+        rescore_multiplier: Shortlist size as a multiple of n_results
+
+    Returns:
+        List of dicts with dimensions, mode, recall, bytes per vector held in memory
+        and bytes per vector stored in total (codes plus full-precision vectors)
+    """
+    ids = [f"chunk_{i}" for i in range(len(chunk_embeddings))]
+
+    baseline = QuantizedIndex(mode="float32")
+    baseline.build(ids, chunk_embeddings)
+    expected = [set(baseline.search(q, n_results)[0]) for q in question_embeddings]
+
+    report = []
+    for dimensions, mode in configs:
+        index = QuantizedIndex(mode=mode)
+        index.build(ids, normalize_embeddings(chunk_embeddings, dimensions))
+
+        hits = 0
+        for question, relevant in zip(normalize_embeddings(question_embeddings, dimensions), expected):
+            found, _ = index.search(question, n_results, rescore_multiplier)
+            hits += len(relevant.intersection(found))
+
+        report.append({
+            "dimensions": dimensions,
+            "mode": mode,
+            "recall": hits / max(sum(len(r) for r in expected), 1),
+            "bytes_per_vector": index.memory_bytes() / max(len(ids), 1),
+            "stored_bytes_per_vector": index.storage_bytes() / max(len(ids), 1),
+        })
+
+    return report
+
+
+def format_report(report):
+    """Format the comparison as a plain-text table."""
+    lines = [f"{'dims':>6} {'mode':>8} {'recall':>8} {'memory B/vec':>13} {'stored B/vec':>13}"]
+    for row in report:
+        lines.append(
+            f"{row['dimensions']:>6} {row['mode']:>8} {row['recall']:>8.3f} {row['bytes_per_vector']:>13.0f} "
+            f"{row['stored_bytes_per_vector']:>13.0f}"
+        )
+    return "\n".join(lines)
+
+
+# Usage (from the repository root): PYTHONPATH=src python -m database.storage_report report.pdf [questions.txt]
+if __name__ == "__main__":
+    pdf_path = sys.argv[1]
+    questions = DEFAULT_QUESTIONS
+    if len(sys.argv) > 2:
+        with open(sys.argv[2]) as f:
+            questions = [line.strip() for line in f if line.strip()]
+
+    markdown_text = PDFHandler(pdf_path=pdf_path).extract_markdown()
+    chunks = MarkdownTextSplitter(chunk_size=1000, chunk_overlap=100).split_text(markdown_text)
+
+    client = OpenAIClient()
+    chunk_embeddings = []
+    for start in range(0, len(chunks), 100):
+        chunk_embeddings.extend(client.get_embeddings(chunks[start:start + 100]))
+    question_embeddings = client.get_embeddings(questions)
+
+    print(f"{len(chunks)} chunks, {len(questions)} questions")
+    print(format_report(compare_storage_modes(np.array(chunk_embeddings), np.array(question_embeddings))))
@@ -0,0 +1,384 @@
+import os
+import re
+import numpy as np
+from typing import Dict, List, Optional
+
+# Canonical metrics and the phrases (English and Dutch) that refer to them
+METRIC_ALIASES = {
+    "revenue": ["revenue", "revenues", "total revenue", "total revenues", "net sales", "omzet", "opbrengsten"],
+    "ebitda": ["ebitda", "adjusted ebitda", "ebitda al", "adjusted ebitda al"],
+    "operating_profit": ["operating profit", "operating result", "ebit", "bedrijfsresultaat"],
+    "net_profit": ["net profit", "net income", "net result", "profit for the year", "nettowinst", "nettoresultaat"],
+    "free_cash_flow": ["free cash flow", "vrije kasstroom"],
+    "capex": ["capex", "capital expenditure", "capital expenditures", "investeringen"],
+    "headcount": ["employees", "number of employees", "headcount", "fte", "fte's", "medewerkers", "werknemers"],
+    "dividend_per_share": ["dividend per share", "dividend per aandeel", "dps"],
+    "earnings_per_share": ["earnings per share", "eps", "winst per aandeel"],
+    "net_debt": ["net debt", "netto schuld"],
+}
+
+# Words that may surround a metric without changing what is asked. Any other word left
+# over in a question (a segment, "margin", "risk", "guidance", "why", ...) is a qualifier,
+# and qualified questions go to the LLM.
+FILLER_WORDS = {
+    "what", "what's", "whats", "which", "is", "are", "was", "were", "the", "a", "an", "of", "for",
+    "in", "during", "our", "its", "their", "company", "company's", "group", "group's", "total",
+    "reported", "figure", "amount", "number", "year", "fiscal", "financial", "full", "how", "much",
+    "many", "did", "do", "does", "we", "have", "had", "please", "tell", "me", "give", "show",
+    "wat", "waren", "zijn", "de", "het", "een", "van", "voor", "tijdens", "onze", "ons", "hun",
+    "totale", "totaal", "groep", "bedrijf", "jaar", "boekjaar", "hoeveel", "hoe", "veel",
+    "bedroeg", "bedroegen", "hadden", "geef", "toon",
+}
+
+PERIOD_PATTERN = re.compile(r"\b(?:FY\s?)?(?:Q[1-4]\s?|H[12]\s?)?(?:19|20)\d{2}(?:/\d{2})?\b", re.IGNORECASE)
+
+
+def normalize_period(text: str) -> str:
+    """Normalize a period like "FY 2023", "H1 2024" or "Q3 2023" to "FY2023", "H12024", "Q32023"."""
+    return text.upper().replace(" ", "")
+
+
+def normalize_label(text: str) -> str:
+    """Lowercase a row label and strip markdown, footnote markers and parenthesized units."""
+    text = re.sub(r"[*_`]", "", text)
+    text = re.sub(r"\(.*?\)", "", text)
+    text = re.sub(r"\s*\d+\)$", "", text)
+    return re.sub(r"\s+", " ", text).strip(" :").lower()
+
+
+def parse_number(cell: str) -> Optional[float]:
+    """
+    Parse a table cell as a number.
+
+    Handles thousands separators in both English and Dutch notation, negative
+    numbers written as (123) or with a minus sign, and trailing units like %.
+
+    Returns:
+        The number, or None if the cell does not hold one
+    """
+    # Trailing footnote markers such as "5,432 1)" or "5,432¹" are not part of the number
+    text = re.sub(r"(\s+\d{1,2}\)|[¹²³⁴⁵⁶⁷⁸⁹⁰]+)$", "", cell.strip())
+    text = re.sub(r"[*_`€$£\s]", "", text)
+    negative = (text.startswith("(") and text.endswith(")")) or text[:1] in ("-", "−", "–")
+    digits = re.sub(r"[^\d.,]", "", text)
+    if not re.search(r"\d", digits):
+        return None
+
+    if "," in digits and "." in digits:
+        # The separator that comes last is the decimal separator
+        decimal = "," if digits.rfind(",") > digits.rfind(".") else "."
+        thousands = "." if decimal == "," else ","
+        digits = digits.replace(thousands, "").replace(decimal, ".")
+    elif "," in digits or "." in digits:
+        separator = "," if "," in digits else "."
+        parts = digits.split(separator)
+        if len(parts) > 2 or (len(parts[-1]) == 3 and parts[0] not in ("", "0")):
+            # 1,234 or 1.234.567: thousands separators
+            digits = "".join(parts)
+        else:
+            digits = digits.replace(separator, ".")
+
+    try:
+        value = float(digits)
+    except ValueError:
+        return None
+    return -value if negative else value
+
+
+def match_metric(text: str):
+    """
+    Find the canonical metric named in a question or row label.
+
+    The longest matching alias wins. Periods and filler words are ignored; every
+    other remaining word is returned as a qualifier.
+
+    Returns:
+        Tuple of (canonical metric name or None, sorted list of qualifier words)
+    """
+    lowered = PERIOD_PATTERN.sub(" ", normalize_label(text))
+    best_metric, best_alias = None, ""
+    for metric, aliases in METRIC_ALIASES.items():
+        for alias in aliases:
+            if len(alias) > len(best_alias) and re.search(rf"\b{re.escape(alias)}\b", lowered):
+                best_metric, best_alias = metric, alias
+    if best_metric is not None:
+        lowered = re.sub(rf"\b{re.escape(best_alias)}\b", " ", lowered, count=1)
+    words = re.findall(r"[\w']+", lowered)
+    return best_metric, sorted({word for word in words if word not in FILLER_WORDS})
+
+
+def detect_unit(*texts: str) -> str:
+    """Detect the unit of a figure from its row label, column header or table caption."""
+    for text in texts:
+        if not text:
+            continue
+        lowered = text.lower()
+        if "%" in lowered or "percent" in lowered:
+            return "%"
+        if re.search(r"\bfte", lowered):
+            return "FTE"
+
+        currency = "EUR" if ("€" in text or re.search(r"\b(eur|euros?)\b", lowered)) else ""
+        scale = ""
+        if re.search(r"\b(billion|bn|mld|miljard)\b", lowered):
+            scale = "billion"
+        elif re.search(r"\b(million|millions|mln|mn|m|miljoen)\b", lowered):
+            scale = "million"
+        unit = " ".join(part for part in (currency, scale) if part)
+        if unit:
+            return unit
+    return ""
+
+
+def split_row(line: str) -> List[str]:
+    return [cell.strip() for cell in line.strip().strip("|").split("|")]
+
+
+def iter_markdown_tables(markdown: str):
+    """
+    Find markdown tables in a text.
+
+    Returns:
+        A generator of (caption, header cells, rows, table markdown) tuples, where the
+        caption is the last line of text before the table
+    """
+    lines = markdown.splitlines()
+    caption = ""
+    i = 0
+    while i < len(lines):
+        line = lines[i].strip()
+        is_table = (
+            line.startswith("|")
+            and i + 1 < len(lines)
+            and re.match(r"^\|?\s*:?-{3,}", lines[i + 1].strip())
+        )
+        if not is_table:
+            if line:
+                caption = line
+            i += 1
+            continue
+
+        header = split_row(line)
+        table_lines = [lines[i], lines[i + 1]]
+        rows = []
+        i += 2
+        while i < len(lines) and lines[i].strip().startswith("|"):
+            table_lines.append(lines[i])
+            rows.append(split_row(lines[i]))
+            i += 1
+        yield caption, header, rows, "\n".join(table_lines)
+
+
+class TableIndex:
+    """
+    Columnar index of the figures found in the document's tables.
+
+    Every figure is stored as one row of parallel typed columns (canonical metric,
+    qualifiers, period, value, unit, source table), so recognized metric questions
+    can be answered directly from the index instead of through retrieval and the LLM.
+    Figures are appended as lists during ingestion and stored as numpy arrays by
+    save() and load(), so lookups filter with boolean masks.
+    """
+
+    def __init__(self, index_path: Optional[str] = None):
+        """
+        Args:
+            index_path: Optional path prefix for persisting the index
+        """
+        self.index_path = index_path
+        self.clear()
+
+    @property
+    def index_file(self):
+        return f"{self.index_path}_tables.npz"
+
+    def clear(self):
+        # Canonical metric key per row ("" for rows that are not a known metric)
+        self.metrics: List[str] = []
+        # Words of the row label besides the metric, e.g. "consumer" for "Revenue Consumer"
+        self.qualifiers: List[str] = []
+        self.labels: List[str] = []
+        self.periods: List[str] = []
+        self.years: List[int] = []
+        self.values: List[float] = []
+        self.units: List[str] = []
+        self.table_ids: List[int] = []
+        self.tables: List[str] = []
+        self.table_pages: List[int] = []
+
+    def add_page(self, markdown: str, page_number: int):
+        """
+        Extract the figures from the tables on one page.
+
+        Args:
+            markdown: Markdown of the page
+            page_number: 1-based page number, used in citations
+        """
+        for caption, header, rows, table_markdown in iter_markdown_tables(markdown):
+            period_columns = {}
+            for column, cell in enumerate(header):
+                match = PERIOD_PATTERN.search(cell)
+                if column > 0 and match:
+                    period_columns[column] = normalize_period(match.group(0))
+            if not period_columns:
+                continue
+
+            table_id = len(self.tables)
+            self.tables.append(table_markdown)
+            self.table_pages.append(page_number)
+
+            for row in rows:
+                if not row or not normalize_label(row[0]):
+                    continue
+                metric, qualifiers = match_metric(row[0])
+                unit = detect_unit(row[0], header[0], caption)
+                for column, period in period_columns.items():
+                    if column >= len(row):
+                        continue
+                    value = parse_number(row[column])
+                    if value is None:
+                        continue
+                    self.metrics.append(metric or "")
+                    self.qualifiers.append(" ".join(qualifiers))
+                    self.labels.append(re.sub(r"[*_`]", "", row[0]).strip())
+                    self.periods.append(period)
+                    self.years.append(self._period_order(period))
+                    self.values.append(value)
+                    self.units.append(unit or detect_unit(row[column]))
+                    self.table_ids.append(table_id)
+
+    def save(self):
+        """Convert the columns to typed arrays and (if an index path is set) persist them."""
+        self.metrics = np.array(self.metrics, dtype=str)
+        self.qualifiers = np.array(self.qualifiers, dtype=str)
+        self.labels = np.array(self.labels, dtype=str)
+        self.periods = np.array(self.periods, dtype=str)
+        self.years = np.array(self.years, dtype=np.int32)
+        self.values = np.array(self.values, dtype=np.float64)
+        self.units = np.array(self.units, dtype=str)
+        self.table_ids = np.array(self.table_ids, dtype=np.int32)
+        self.tables = np.array(self.tables, dtype=str)
+        self.table_pages = np.array(self.table_pages, dtype=np.int32)
+        if self.index_path is None:
+            return
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.index_file)), exist_ok=True)
+        np.savez_compressed(
+            self.index_file,
+            metrics=self.metrics,
+            qualifiers=self.qualifiers,
+            labels=self.labels,
+            periods=self.periods,
+            years=self.years,
+            values=self.values,
+            units=self.units,
+            table_ids=self.table_ids,
+            tables=self.tables,
+            table_pages=self.table_pages
+        )
+
+    def load(self):
+        """
+        Load a persisted index.
+
+        Returns:
+            True if the index was found on disk, False otherwise
+        """
+        if self.index_path is None or not os.path.exists(self.index_file):
+            return False
+
+        data = np.load(self.index_file)
+        self.metrics = data["metrics"]
+        self.qualifiers = data["qualifiers"]
+        self.labels = data["labels"]
+        self.periods = data["periods"]
+        self.years = data["years"]
+        self.values = data["values"]
+        self.units = data["units"]
+        self.table_ids = data["table_ids"]
+        self.tables = data["tables"]
+        self.table_pages = data["table_pages"]
+        return True
+
+    def delete(self):
+        """Remove the persisted index and clear it."""
+        if self.index_path is not None and os.path.exists(self.index_file):
+            os.remove(self.index_file)
+        self.clear()
+
+    def recognize_metric(self, query: str) -> Optional[str]:
+        """
+        Recognize a plain metric lookup in a query.
+
+        Only questions that consist of a metric, an optional period and filler words
+        are lookups; "revenue of the consumer segment", "EBITDA margin" or "risks to
+        revenue" are not.
+
+        Returns:
+            The canonical metric name, or None if the query is not a simple lookup
+        """
+        metric, qualifiers = match_metric(query)
+        return metric if not qualifiers else None
+
+    def lookup(self, query: str) -> Optional[Dict]:
+        """
+        Answer a metric question directly from the index.
+
+        Only rows whose label is the bare metric (e.g. "Revenue", not "Revenue
+        Consumer" or "EBITDA margin") can answer a lookup.
+
+        Args:
+            query: The user's question
+
+        Returns:
+            Dict with label, period, value, unit, table and page, or None if the
+            question is not a recognized lookup or the figure is not in the index
+        """
+        metric = self.recognize_metric(query)
+        if metric is None or not len(self.metrics):
+            return None
+
+        periods = np.asarray(self.periods)
+        years = np.asarray(self.years)
+        mask = (np.asarray(self.metrics) == metric) & (np.asarray(self.qualifiers) == "")
+        period = PERIOD_PATTERN.search(query)
+        if period:
+            key = normalize_period(period.group(0))
+            if re.fullmatch(r"\d{4}", key):
+                # A bare year matches every period of that year; full years are preferred below
+                mask &= years == int(key)
+            else:
+                # Other periods must match exactly; "FY2023" also matches a "2023" column
+                mask &= np.isin(periods, [key, key.removeprefix("FY")])
+        candidates = np.flatnonzero(mask)
+        if not len(candidates):
+            return None
+
+        # Full years before quarters and halves, then the most recent period, then the
+        # first figure in the document
+        full_year = (np.char.find(periods, "Q") < 0) & (np.char.find(periods, "H") < 0)
+        best = candidates[np.lexsort((candidates, -years[candidates], ~full_year[candidates]))[0]]
+        table_id = self.table_ids[best]
+        return {
+            "metric": metric,
+            "label": str(self.labels[best]),
+            "period": str(self.periods[best]),
+            "value": float(self.values[best]),
+            "unit": str(self.units[best]),
+            "table": str(self.tables[table_id]),
+            "page": int(self.table_pages[table_id])
+        }
+
+    @staticmethod
+    def _period_order(period):
+        # Periods are stored without spaces ("FY2023", "Q32023"), so no word boundary before the year
+        year = re.search(r"(?:19|20)\d{2}", period)
+        return int(year.group(0)) if year else 0
+
+
+def format_lookup_answer(fact: Dict) -> str:
+    """Format a table lookup as a short answer."""
+    value = fact["value"]
+    number = f"{value:,.0f}" if value.is_integer() else f"{value:,.4f}".rstrip("0").rstrip(".")
+    unit = f"{number}%" if fact["unit"] == "%" else f"{number} {fact['unit']}".strip()
+    return f"{fact['label']} ({fact['period']}): {unit}"
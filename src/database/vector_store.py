@@ -4,12 +4,41 @@ from chromadb.utils.embedding_functions import OpenAIEmbeddingFunction
 from langchain_text_splitters import MarkdownTextSplitter
 from dotenv import load_dotenv, find_dotenv
 from document_processing.pdf_handler import PDFHandler
+from database.quantized_index import QuantizedIndex, STORAGE_MODES
+from database.mmr import maximal_marginal_relevance
+from database.table_index import TableIndex
+from chat.singleflight import singleflight, make_key
 import uuid
 import datetime
 
+# In quantized modes Chroma only serves documents and metadata by ID; a one-dimensional
+# placeholder keeps it from storing and indexing a second full-precision copy of the vectors
+PLACEHOLDER_EMBEDDING = [0.0]
+
+
+def storage_settings_from_env():
+    """
+    Read the storage settings from the environment.
+    
+    Returns:
+        Dict with storage_mode (RAG_STORAGE_MODE), embedding_dimensions
+        (RAG_EMBEDDING_DIMENSIONS), chroma_host (CHROMA_HOST) and chroma_port
+        (CHROMA_PORT), to pass on to VectorDatabase
+    """
+    dimensions = os.getenv("RAG_EMBEDDING_DIMENSIONS")
+    return {
+        "storage_mode": os.getenv("RAG_STORAGE_MODE", "float32"),
+        "embedding_dimensions": int(dimensions) if dimensions else None,
+        "chroma_host": os.getenv("CHROMA_HOST") or None,
+        "chroma_port": int(os.getenv("CHROMA_PORT", "8000"))
+    }
+
+
 class VectorDatabase:
     def __init__(self, collection_name="default_collection", 
-                 embedding_model="text-embedding-3-small", persist_directory="./chroma_db"):
+                 embedding_model="text-embedding-3-small", persist_directory="./chroma_db",
+                 storage_mode="float32", embedding_dimensions=None, rescore_multiplier=4,
+                 chroma_host=None, chroma_port=8000):
         """
         Initialize a vector database for single PDF storage and retrieval.
         
@@ -17,9 +46,19 @@ class VectorDatabase:
             collection_name: Name of the Chroma collection
             embedding_model: OpenAI embedding model to use
             persist_directory: Directory to persist the Chroma database
+            storage_mode: "float32" searches Chroma directly, "int8" or "binary" search a
+                quantized local index and rescore a shortlist at full precision
+            embedding_dimensions: Optional shortened embedding size to request from the API
+            rescore_multiplier: Shortlist size as a multiple of n_results for quantized search
+            chroma_host: Optional Chroma server to use instead of an embedded store in
+                persist_directory; required when several processes share the store
+            chroma_port: Port of the Chroma server
         """
 
         load_dotenv(find_dotenv())
+
+        if storage_mode not in STORAGE_MODES:
+            raise ValueError(f"Unknown storage mode '{storage_mode}', expected one of {STORAGE_MODES}")
         
         # Use MarkdownTextSplitter instead of MarkdownHeaderTextSplitter
         self.markdown_splitter = MarkdownTextSplitter(
@@ -30,15 +69,22 @@ class VectorDatabase:
         self.collection_name = collection_name
         self.persist_directory = persist_directory
         self.embedding_model = embedding_model
+        self.storage_mode = storage_mode
+        self.embedding_dimensions = embedding_dimensions
+        self.rescore_multiplier = rescore_multiplier
         
-        # Set up ChromaDB client
-        self.client = chromadb.PersistentClient(path=persist_directory)
+        # Set up ChromaDB client; an embedded store may only be opened by a single process
+        if chroma_host:
+            self.client = chromadb.HttpClient(host=chroma_host, port=chroma_port)
+        else:
+            self.client = chromadb.PersistentClient(path=persist_directory)
         
         # Set up OpenAI embedding function
         if os.getenv("OPENAI_API_KEY") is not None:
             self.embedding_function = OpenAIEmbeddingFunction(
                 api_key=os.getenv("OPENAI_API_KEY"),
-                model_name=embedding_model
+                model_name=embedding_model,
+                dimensions=embedding_dimensions
             )
         else:
             raise ValueError("OPENAI_API_KEY environment variable not found")
@@ -48,14 +94,139 @@ class VectorDatabase:
             name=collection_name,
             embedding_function=self.embedding_function
         )
+
+        # Changes on every ingest, so caches keyed on it are invalidated automatically
+        self.document_version, self.index_settings = self._stored_document_state()
+        self._load_indexes()
+    
+    def _load_indexes(self, from_disk=True):
+        """Set up the local indexes, loading the stored document's indexes from disk if asked."""
+        index_path = os.path.join(self.persist_directory, self.collection_name)
+        
+        # Quantized modes keep a compact local index next to the Chroma store
+        self.quantized_index = None
+        if self.storage_mode != "float32":
+            self.quantized_index = QuantizedIndex(mode=self.storage_mode, index_path=index_path)
+            if from_disk:
+                self.quantized_index.load()
+        
+        # Figures from the document's tables, for answering metric lookups directly
+        self.table_index = TableIndex(index_path=index_path)
+        if from_disk:
+            self.table_index.load()
+    
+    def _stored_document_state(self):
+        """
+        Read the version and storage settings (storage mode, embedding dimensions) of the stored document.
+        
+        process_pdf publishes them on the collection after all indexes are written,
+        so other processes only see a new version once it is complete.
+        """
+        metadata = self.collection.metadata or {}
+        if "document_version" in metadata:
+            return metadata["document_version"], (metadata["storage_mode"], metadata.get("embedding_dimensions"))
+        if self.collection.count() > 0:
+            # Processed before the version was published on the collection
+            pdf_info = self.get_collection_info()["pdf_info"]
+            return None, (pdf_info.get("storage_mode", "float32"), pdf_info.get("embedding_dimensions"))
+        return None, None
     
-    def process_pdf(self, pdf_path):
+    def refresh(self):
+        """
+        Pick up a document processed by another process sharing the same store.
+        
+        Returns:
+            True if a different document version was loaded
+        """
+        self.collection = self.client.get_or_create_collection(
+            name=self.collection_name,
+            embedding_function=self.embedding_function
+        )
+        document_version, index_settings = self._stored_document_state()
+        if document_version == self.document_version:
+            return False
+        
+        self.document_version, self.index_settings = document_version, index_settings
+        # Without a published version the document was removed or is still being processed
+        self._load_indexes(from_disk=document_version is not None)
+        return True
+    
+    def embed_texts(self, texts, batch_size=100):
+        """
+        Embed texts in batches with the collection's embedding function.
+        
+        Args:
+            texts: List of texts to embed
+            batch_size: Number of texts per embedding request
+            
+        Returns:
+            List of embeddings
+        """
+        embeddings = []
+        for start in range(0, len(texts), batch_size):
+            embeddings.extend(self.embedding_function(texts[start:start + batch_size]))
+        return embeddings
+    
+    def embed_query(self, query):
+        """
+        Embed a single query, sharing the request with identical in-flight queries.
+        
+        Args:
+            query: Query text
+            
+        Returns:
+            The query embedding
+        """
+        key = make_key("embedding", self.embedding_model, self.embedding_dimensions, query)
+        return singleflight.do(key, lambda: self.embedding_function([query])[0])
+    
+    def iter_chunks(self, pages):
+        """
+        Split streamed markdown pages into chunks.
+        
+        The last chunk of each page is carried over to the next page, so chunks can
+        still span page boundaries while only one page is held in memory.
+        
+        Args:
+            pages: Iterable of markdown strings, one per page
+            
+        Returns:
+            A generator that yields (page number, chunk text) tuples, with the
+            1-based number of the page the chunk starts on
+        """
+        carry, carry_page = "", None
+        for page_number, page in enumerate(pages, start=1):
+            text = carry + page
+            chunks = self.markdown_splitter.split_text(text)
+            if not chunks:
+                continue
+            
+            located = []
+            offset = 0
+            for chunk in chunks:
+                start = text.find(chunk, offset)
+                if start >= 0:
+                    offset = start + 1
+                # Chunks that start inside the carried-over text belong to the previous page
+                located.append((carry_page if 0 <= start < len(carry) else page_number, chunk))
+            
+            carry_page, carry = located.pop()
+            yield from located
+        if carry:
+            yield carry_page, carry
+    
+    def process_pdf(self, pdf_source, filename=None, batch_size=100):
         """
         Process a single PDF file, extract markdown, split into chunks, and store in vector DB.
         Since we're only using one PDF, we'll capture essential metadata automatically.
         
+        The PDF is converted page by page and chunks are stored in batches, so memory
+        use stays bounded for large documents.
+        
         Args:
-            pdf_path: Path to the PDF file
+            pdf_source: Path to the PDF file, or its contents as bytes or a binary file-like object
+            filename: Name to record for a PDF that is not read from disk
+            batch_size: Number of chunks embedded and stored at a time
             
         Returns:
             List of IDs for the stored chunks
@@ -71,72 +242,265 @@ class VectorDatabase:
             # Collection might not exist yet
             pass
         
-        # Create PDFHandler with the given path
-        pdf_handler = PDFHandler(pdf_path=pdf_path)
-
-        # Extract markdown from PDF
-        markdown_text = pdf_handler.extract_markdown()  
+        # Create metadata for the single PDF
+        if isinstance(pdf_source, (str, os.PathLike)):
+            pdf_handler = PDFHandler(pdf_path=pdf_source)
+            pdf_metadata = {
+                "filename": os.path.basename(pdf_source),
+                "file_path": os.path.abspath(pdf_source),
+            }
+        else:
+            # Opened in memory, without a temporary file
+            pdf_handler = PDFHandler(pdf_stream=pdf_source)
+            pdf_metadata = {"filename": filename or "uploaded.pdf"}
+        pdf_metadata["processed_date"] = datetime.datetime.now().isoformat()
+        pdf_metadata["document_version"] = uuid.uuid4().hex
+        pdf_metadata["storage_mode"] = self.storage_mode
+        if self.embedding_dimensions is not None:
+            pdf_metadata["embedding_dimensions"] = self.embedding_dimensions
         
-        # Split the markdown text into chunks - now returns a list of strings
-        chunks = self.markdown_splitter.split_text(markdown_text)
+        def pages_with_tables():
+            # Index the tables of each page while it streams past the chunker
+            for page_number, page in enumerate(pdf_handler.iter_markdown_pages(), start=1):
+                self.table_index.add_page(page, page_number)
+                yield page
         
-        # Create unique IDs for each chunk
-        chunk_ids = [f"chunk_{i}" for i in range(len(chunks))]
+        self.table_index.clear()
+        if self.quantized_index is not None:
+            # Full-precision vectors are appended to disk per batch rather than kept in memory
+            self.quantized_index.start()
+        chunk_ids = []
+        batch = []
+        for page_number, chunk in self.iter_chunks(pages_with_tables()):
+            batch.append((page_number, chunk))
+            if len(batch) == batch_size:
+                self._add_chunks(batch, chunk_ids, pdf_metadata)
+                batch = []
+        if batch:
+            self._add_chunks(batch, chunk_ids, pdf_metadata)
         
-        # Create metadata for the single PDF
-        pdf_metadata = {
-            "filename": os.path.basename(pdf_path),
-            "file_path": os.path.abspath(pdf_path),
-            "processed_date": datetime.datetime.now().isoformat(),
-            "total_chunks": len(chunks),
-        }
+        # The total number of chunks is only known once the whole document is split
+        total_chunks = len(chunk_ids)
+        pdf_metadata["total_chunks"] = total_chunks
+        for start in range(0, total_chunks, batch_size):
+            ids = chunk_ids[start:start + batch_size]
+            self.collection.update(
+                ids=ids,
+                metadatas=[
+                    {"total_chunks": total_chunks, "chunk_position": f"{i+1}/{total_chunks}"}
+                    for i in range(start, start + len(ids))
+                ]
+            )
+        
+        if self.quantized_index is not None:
+            self.quantized_index.finish()
+        self.table_index.save()
+        
+        # Publish the new version last, so other processes only pick up a complete document
+        published = {key: pdf_metadata[key] for key in ("document_version", "storage_mode", "embedding_dimensions")
+                     if key in pdf_metadata}
+        self.collection.modify(metadata=published)
+        self.document_version = pdf_metadata["document_version"]
+        self.index_settings = (self.storage_mode, self.embedding_dimensions)
+        
+        print(f"Processed PDF: {pdf_metadata['filename']}")
+        print(f"Created {total_chunks} chunks")
+        print(f"Indexed {len(self.table_index.values)} figures from {len(self.table_index.tables)} tables")
+        
+        return chunk_ids, pdf_metadata
+    
+    def _add_chunks(self, batch, chunk_ids, pdf_metadata):
+        """Store a batch of (page number, chunk) tuples, appending their IDs (and embeddings for quantized modes)."""
+        chunks = [chunk for _, chunk in batch]
+        offset = len(chunk_ids)
+        ids = [f"chunk_{offset + i}" for i in range(len(chunks))]
         
         # Prepare metadata for each chunk
         metadatas = []
-        for i, chunk in enumerate(chunks):
+        for i, (page_number, chunk) in enumerate(batch):
             # Create chunk-specific metadata
             chunk_metadata = pdf_metadata.copy()
             chunk_metadata.update({
-                "chunk_index": i,
+                "chunk_index": offset + i,
+                "page": page_number,
                 "chunk_size_chars": len(chunk),
-                "chunk_position": f"{i+1}/{len(chunks)}",
                 "content_preview": chunk[:100] + "..." if len(chunk) > 100 else chunk
             })
             metadatas.append(chunk_metadata)
         
         # Add chunks to the collection
-        self.collection.add(
-            documents=chunks,  # chunks is now a list of strings, so we can use it directly
-            ids=chunk_ids,
-            metadatas=metadatas
-        )
-        
-        print(f"Processed PDF: {pdf_metadata['filename']}")
-        print(f"Created {len(chunks)} chunks")
+        if self.quantized_index is None:
+            self.collection.add(
+                documents=chunks,
+                ids=ids,
+                metadatas=metadatas
+            )
+        else:
+            # The quantized index keeps the only full-precision copy of the vectors
+            batch_embeddings = self.embed_texts(chunks)
+            self.collection.add(
+                documents=chunks,
+                embeddings=[PLACEHOLDER_EMBEDDING] * len(chunks),
+                ids=ids,
+                metadatas=metadatas
+            )
+            self.quantized_index.add(ids, batch_embeddings)
         
-        return chunk_ids, pdf_metadata
+        chunk_ids.extend(ids)
     
-    def search(self, query, n_results=3):
+    def search(self, query, n_results=3, mmr=False, fetch_k=20, lambda_mult=0.5):
         """
         Search for chunks similar to the query.
         
         Args:
             query: Query text
             n_results: Number of results to return
+            mmr: Re-rank an over-fetched candidate set with maximal marginal relevance
+            fetch_k: Number of candidates to fetch when mmr is enabled
+            lambda_mult: MMR trade-off, 1.0 for pure relevance and 0.0 for pure diversity
             
         Returns:
             Search results from the collection
         """
+        self._check_index_settings()
+        query_embedding = self.embed_query(query)
+        if not mmr:
+            if self.quantized_index is not None:
+                return self._search_quantized(query_embedding, n_results)
+
+            results = self.collection.query(
+                query_embeddings=[query_embedding],
+                n_results=n_results,
+                include=["documents", "metadatas", "distances"]
+            )
+            return results
+        
+        fetch_k = max(fetch_k, n_results)
+        if self.quantized_index is not None:
+            candidates = self._search_quantized(query_embedding, fetch_k, include_embeddings=True)
+        else:
+            candidates = self.collection.query(
+                query_embeddings=[query_embedding],
+                n_results=fetch_k,
+                include=["documents", "metadatas", "distances", "embeddings"]
+            )
+        
+        selected = maximal_marginal_relevance(
+            query_embedding,
+            candidates["embeddings"][0],
+            k=n_results,
+            lambda_mult=lambda_mult
+        )
+        return {
+            key: [[candidates[key][0][i] for i in selected]]
+            for key in ("ids", "documents", "metadatas", "distances")
+        }
+    
+    def search_many(self, queries, n_results=3):
+        """
+        Search for chunks similar to each of several queries at once.
+        
+        The queries are embedded in batched requests and looked up with a single
+        multi-query call instead of one round-trip per query.
+        
+        Args:
+            queries: List of query texts
+            n_results: Number of results to return per query
+            
+        Returns:
+            List of search results, one per query, in the same format as search()
+        """
+        if not queries:
+            return []
+        
+        self._check_index_settings()
+        query_embeddings = self.embed_texts(queries)
+        if self.quantized_index is not None:
+            return [self._search_quantized(embedding, n_results) for embedding in query_embeddings]
+        
         results = self.collection.query(
-            query_texts=[query],
+            query_embeddings=query_embeddings,
             n_results=n_results,
             include=["documents", "metadatas", "distances"]
         )
+        return [
+            {key: [results[key][i]] for key in ("ids", "documents", "metadatas", "distances")}
+            for i in range(len(queries))
+        ]
+    
+    def _check_index_settings(self):
+        """Raise if the stored document was processed with other storage settings than this instance."""
+        if self.index_settings is not None and self.index_settings != (self.storage_mode, self.embedding_dimensions):
+            storage_mode, embedding_dimensions = self.index_settings
+            raise ValueError(
+                f"The stored document was processed with storage_mode='{storage_mode}' and "
+                f"embedding_dimensions={embedding_dimensions}; process the PDF again to search with "
+                f"storage_mode='{self.storage_mode}' and embedding_dimensions={self.embedding_dimensions}"
+            )
+    
+    def _search_quantized(self, query_embedding, n_results, include_embeddings=False):
+        """Search the quantized index and return results in Chroma's query format."""
+        ids, distances = self.quantized_index.search(
+            query_embedding,
+            n_results=n_results,
+            rescore_multiplier=self.rescore_multiplier
+        )
+        
+        documents, metadatas = [], []
+        if ids:
+            records = self.collection.get(ids=ids, include=["documents", "metadatas"])
+            by_id = {
+                record_id: (doc, metadata)
+                for record_id, doc, metadata in zip(records["ids"], records["documents"], records["metadatas"])
+            }
+            documents = [by_id[record_id][0] for record_id in ids]
+            metadatas = [by_id[record_id][1] for record_id in ids]
+        
+        results = {
+            "ids": [ids],
+            "documents": [documents],
+            "metadatas": [metadatas],
+            "distances": [distances]
+        }
+        if include_embeddings:
+            results["embeddings"] = [self.quantized_index.get_vectors(ids)]
         return results
     
+    def lookup_metric(self, query):
+        """
+        Answer a plain metric question (revenue, EBITDA, headcount, ...) from the table index.
+        
+        Args:
+            query: Query text
+            
+        Returns:
+            Dict describing the figure and its source table, or None if the query is
+            not a recognized lookup
+        """
+        return self.table_index.lookup(query)
+    
+    def get_chunks(self, ids):
+        """
+        Get the text of stored chunks by ID.
+        
+        Args:
+            ids: Chunk IDs to look up
+            
+        Returns:
+            List of chunk texts in the order of the IDs (empty strings for unknown IDs)
+        """
+        records = self.collection.get(ids=ids, include=["documents"])
+        by_id = dict(zip(records["ids"], records["documents"]))
+        return [by_id.get(chunk_id, "") for chunk_id in ids]
+    
     def delete_collection(self):
         """Delete the current collection from the database."""
         self.client.delete_collection(name=self.collection_name)
+        if self.quantized_index is not None:
+            self.quantized_index.delete()
+        self.table_index.delete()
+        self.document_version = None
+        self.index_settings = None
     
     def get_collection_info(self):
         """Get information about the collection and PDF."""
@@ -146,7 +510,7 @@ class VectorDatabase:
         if count > 0:
             first_chunk = self.collection.get(ids=["chunk_0"], include=["metadatas"])
             pdf_info = {k: v for k, v in first_chunk['metadatas'][0].items() 
-                       if k not in ['chunk_index', 'chunk_size_chars', 'chunk_position', 'content_preview']}
+                       if k not in ['chunk_index', 'page', 'chunk_size_chars', 'chunk_position', 'content_preview']}
             
             return {
                 "collection_name": self.collection_name,
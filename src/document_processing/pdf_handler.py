@@ -1,3 +1,4 @@
+import pymupdf
 import pymupdf4llm
 import os
 import logging
@@ -6,19 +7,55 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(level
 logger = logging.getLogger(__name__)
 
 class PDFHandler:
-    def __init__(self, pdf_path):
+    def __init__(self, pdf_path=None, pdf_stream=None):
+        """
+        Args:
+            pdf_path: Path to a PDF file on disk
+            pdf_stream: PDF contents as bytes, or a binary file-like object (such as an
+                upload) that is read into bytes; opened in memory
+        """
+        if pdf_path is None and pdf_stream is None:
+            raise ValueError("Either pdf_path or pdf_stream must be provided")
+
         self.pdf_path = pdf_path
-    
-    def extract_markdown(self):
-        try:
-            if not os.path.exists(self.pdf_path):
-                raise FileNotFoundError(f"PDF file not found: {self.pdf_path}")
-            
-            logger.info(f"Processing PDF: {self.pdf_path}")
+        self.pdf_stream = pdf_stream
+
+    def open_document(self):
+        if self.pdf_stream is not None:
+            logger.info("Processing PDF from memory")
+            stream = self.pdf_stream
+            if not isinstance(stream, (bytes, bytearray)):
+                # PyMuPDF only accepts bytes or an exact io.BytesIO, not subclasses such as
+                # Streamlit's UploadedFile, so read file-like objects into bytes first
+                stream = stream.getvalue() if hasattr(stream, "getvalue") else stream.read()
+            return pymupdf.open(stream=stream, filetype="pdf")
+
+        if not os.path.exists(self.pdf_path):
+            raise FileNotFoundError(f"PDF file not found: {self.pdf_path}")
+
+        logger.info(f"Processing PDF: {self.pdf_path}")
+        return pymupdf.open(self.pdf_path)
 
-            markdown_text = pymupdf4llm.to_markdown(self.pdf_path)
+    def iter_markdown_pages(self):
+        """
+        Yield the markdown of the PDF one page at a time.
 
-            return markdown_text
+        Header levels are determined once for the whole document, so each page is
+        formatted the same way as in a single full-document conversion.
+        """
+        try:
+            doc = self.open_document()
+        except Exception as e:
+            raise Exception(f"Error splitting PDF: {str(e)}")
 
+        try:
+            hdr_info = pymupdf4llm.IdentifyHeaders(doc)
+            for page_number in range(doc.page_count):
+                yield pymupdf4llm.to_markdown(doc, pages=[page_number], hdr_info=hdr_info)
         except Exception as e:
             raise Exception(f"Error splitting PDF: {str(e)}")
+        finally:
+            doc.close()
+
+    def extract_markdown(self):
+        return "".join(self.iter_markdown_pages())
@@ -0,0 +1,244 @@
+import asyncio
+import base64
+import hashlib
+import json
+import random
+import threading
+import time
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+CANNED_ANSWER = ("Based on the excerpts, revenue grew modestly compared to last year while "
+                 "EBITDA remained stable. The report does not give further detail on this topic.")
+
+
+class FakeOpenAISettings:
+    """Behaviour of the fake server, adjustable while it is running."""
+
+    def __init__(self, latency_ms: float = 200.0, jitter_ms: float = 50.0, embedding_latency_ms: float = 50.0,
+                 tokens_per_second: float = 80.0, rate_limit_rpm: int = None, error_rate: float = 0.0,
+                 chat_error_rate: float = 0.0):
+        """
+        Args:
+            latency_ms: Mean time before a chat completion starts responding
+            jitter_ms: Standard deviation added to every latency
+            embedding_latency_ms: Mean latency of an embeddings request
+            tokens_per_second: Streaming speed of chat completions
+            rate_limit_rpm: Optional requests-per-minute limit, answered with HTTP 429
+            error_rate: Fraction of requests that fail with HTTP 500
+            chat_error_rate: Fraction of chat completions that fail with HTTP 500, so
+                generation can fail while retrieval (embeddings) still works
+        """
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.embedding_latency_ms = embedding_latency_ms
+        self.tokens_per_second = tokens_per_second
+        self.rate_limit_rpm = rate_limit_rpm
+        self.error_rate = error_rate
+        self.chat_error_rate = chat_error_rate
+
+
+class RequestWindow:
+    """Sliding one-minute window of request timestamps for rate limiting."""
+
+    def __init__(self):
+        self.timestamps = []
+
+    def allow(self, limit):
+        now = time.monotonic()
+        self.timestamps = [t for t in self.timestamps if now - t < 60.0]
+        if limit is not None and len(self.timestamps) >= limit:
+            return False, 60.0 - (now - self.timestamps[0])
+        self.timestamps.append(now)
+        return True, 0.0
+
+
+def fake_embedding(text: str, dimensions: int = 1536):
+    """Deterministic unit vector for a text, so identical texts get identical embeddings."""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dimensions).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def create_app(settings: FakeOpenAISettings = None) -> FastAPI:
+    """
+    Create a FastAPI app that speaks the OpenAI chat-completions and embeddings endpoints.
+
+    Args:
+        settings: Latency, rate-limit and error behaviour of the server
+
+    Returns:
+        The FastAPI app; app.state.stats counts requests, 429s and 500s
+    """
+    settings = settings or FakeOpenAISettings()
+    app = FastAPI()
+    app.state.settings = settings
+    app.state.stats = {"requests": 0, "rate_limited": 0, "errors": 0}
+    window = RequestWindow()
+
+    def delay(mean_ms):
+        return max(0.0, random.gauss(mean_ms, settings.jitter_ms)) / 1000.0
+
+    def check_limits(error_rate):
+        app.state.stats["requests"] += 1
+        allowed, retry_after = window.allow(settings.rate_limit_rpm)
+        if not allowed:
+            app.state.stats["rate_limited"] += 1
+            return JSONResponse(
+                status_code=429,
+                headers={"retry-after": f"{retry_after:.1f}"},
+                content={"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}}
+            )
+        if random.random() < error_rate:
+            app.state.stats["errors"] += 1
+            return JSONResponse(status_code=500, content={"error": {"message": "Injected server error", "type": "server_error"}})
+        return None
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        rejection = check_limits(settings.error_rate)
+        if rejection is not None:
+            return rejection
+
+        texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        await asyncio.sleep(delay(settings.embedding_latency_ms))
+
+        data = []
+        for i, text in enumerate(texts):
+            vector = fake_embedding(text, body.get("dimensions") or 1536)
+            if body.get("encoding_format") == "base64":
+                embedding = base64.b64encode(vector.tobytes()).decode("ascii")
+            else:
+                embedding = vector.tolist()
+            data.append({"object": "embedding", "index": i, "embedding": embedding})
+
+        tokens = sum(len(text.split()) for text in texts)
+        return {
+            "object": "list",
+            "data": data,
+            "model": body["model"],
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens}
+        }
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        rejection = check_limits(max(settings.error_rate, settings.chat_error_rate))
+        if rejection is not None:
+            return rejection
+
+        completion_id = f"chatcmpl-{random.getrandbits(64):x}"
+        created = int(time.time())
+        prompt_tokens = sum(len(str(message.get("content", "")).split()) for message in body["messages"])
+        words = CANNED_ANSWER.split(" ")
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(words),
+            "total_tokens": prompt_tokens + len(words)
+        }
+
+        await asyncio.sleep(delay(settings.latency_ms))
+
+        if not body.get("stream"):
+            await asyncio.sleep(len(words) / settings.tokens_per_second)
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": body["model"],
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": CANNED_ANSWER},
+                    "finish_reason": "stop"
+                }],
+                "usage": usage
+            }
+
+        def chunk(delta, finish_reason=None):
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": body["model"],
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            }
+            return f"data: {json.dumps(payload)}\n\n"
+
+        async def events():
+            yield chunk({"role": "assistant", "content": ""})
+            for i, word in enumerate(words):
+                await asyncio.sleep(1.0 / settings.tokens_per_second)
+                yield chunk({"content": word if i == 0 else f" {word}"})
+            yield chunk({}, finish_reason="stop")
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+class FakeOpenAIServer:
+    """Runs the fake OpenAI app with uvicorn in a background thread."""
+
+    def __init__(self, settings: FakeOpenAISettings = None, host: str = "127.0.0.1", port: int = 8765):
+        self.app = create_app(settings)
+        self.host = host
+        self.port = port
+        self.server = uvicorn.Server(uvicorn.Config(self.app, host=host, port=port, log_level="warning"))
+        self.thread = None
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}/v1"
+
+    @property
+    def stats(self):
+        return self.app.state.stats
+
+    def _run(self):
+        try:
+            self.server.run()
+        except SystemExit:
+            # uvicorn exits when it cannot bind the port; start() reports the failure
+            pass
+
+    def start(self, timeout: float = 10.0):
+        """
+        Start the server and wait until it accepts connections.
+
+        Args:
+            timeout: Seconds to wait for the server to start
+
+        Raises:
+            RuntimeError: If the server stopped (e.g. the port is in use) or did not start in time
+        """
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        deadline = time.monotonic() + timeout
+        while not self.server.started:
+            if not self.thread.is_alive():
+                raise RuntimeError(f"Fake OpenAI server failed to start on {self.host}:{self.port}")
+            if time.monotonic() > deadline:
+                self.server.should_exit = True
+                raise RuntimeError(f"Fake OpenAI server did not start within {timeout} seconds")
+            time.sleep(0.05)
+        return self
+
+    def stop(self):
+        self.server.should_exit = True
+        self.thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+# Usage (from the repository root): PYTHONPATH=src python -m loadtest.fake_openai
+# then point the app at it with OPENAI_BASE_URL=http://127.0.0.1:8765/v1
+if __name__ == "__main__":
+    uvicorn.run(create_app(), host="127.0.0.1", port=8765)
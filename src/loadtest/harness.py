@@ -0,0 +1,243 @@
+import argparse
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+import pymupdf
+from loadtest.fake_openai import FakeOpenAIServer, FakeOpenAISettings
+
+QUESTIONS = [
+    "What was the total revenue this year?",
+    "How did EBITDA develop?",
+    "What is the dividend per share?",
+    "How many employees does the company have?",
+    "What are the main risks?",
+    "Tell me more",
+    "And what about the outlook?",
+    "Why did that change?",
+]
+
+SECTION_TEMPLATE = """## {title}
+
+In {year} the company reported revenue of EUR {revenue} million and adjusted EBITDA of EUR {ebitda} million.
+Capital expenditure amounted to EUR {capex} million, mainly invested in fibre and mobile networks.
+The number of employees was {fte} FTE at year end. The proposed dividend per share is EUR {dividend}.
+Key risks include regulatory changes, cyber security threats and competition in the consumer market.
+"""
+
+
+def make_sample_pdf(path: str, pages: int = 30):
+    """Write a synthetic annual-report-like PDF, so the harness needs no real document."""
+    doc = pymupdf.open()
+    rng = random.Random(42)
+    for page_number in range(pages):
+        page = doc.new_page()
+        text = "\n".join(
+            SECTION_TEMPLATE.format(
+                title=f"Section {page_number + 1}.{i + 1}",
+                year=2020 + (page_number + i) % 5,
+                revenue=rng.randint(4000, 6000),
+                ebitda=rng.randint(2000, 2600),
+                capex=rng.randint(1000, 1400),
+                fte=rng.randint(9000, 11000),
+                dividend=f"0.{rng.randint(10, 20)}"
+            )
+            for i in range(3)
+        )
+        page.insert_textbox(pymupdf.Rect(50, 50, 550, 800), text, fontsize=9)
+    doc.save(path)
+    doc.close()
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+class Metrics:
+    """Thread-safe collection of latencies and errors per operation."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.wall_time: Dict[str, float] = {}
+
+    def record(self, operation, started, error=None):
+        with self.lock:
+            self.latencies.setdefault(operation, []).append(time.perf_counter() - started)
+            self.errors.setdefault(operation, 0)
+            if error is not None:
+                self.errors[operation] += 1
+
+    def report(self):
+        lines = [f"{'operation':<10} {'count':>6} {'errors':>7} {'err %':>6} {'ops/s':>7} "
+                 f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"]
+        for operation, latencies in self.latencies.items():
+            errors = self.errors[operation]
+            wall_time = self.wall_time.get(operation) or sum(latencies)
+            lines.append(
+                f"{operation:<10} {len(latencies):>6} {errors:>7} {100.0 * errors / len(latencies):>6.1f} "
+                f"{len(latencies) / wall_time:>7.2f} "
+                f"{percentile(latencies, 50) * 1000:>8.0f} {percentile(latencies, 95) * 1000:>8.0f} "
+                f"{percentile(latencies, 99) * 1000:>8.0f}"
+            )
+        return "\n".join(lines)
+
+
+def simulate_ingest(pdf_path, persist_directory, user_id, metrics):
+    """One user uploading and processing the document into their own collection."""
+    from database.vector_store import VectorDatabase
+
+    started = time.perf_counter()
+    try:
+        vector_db = VectorDatabase(collection_name=f"loadtest_ingest_{user_id}", persist_directory=persist_directory)
+        vector_db.process_pdf(pdf_path)
+        metrics.record("ingest", started)
+    except Exception as e:
+        metrics.record("ingest", started, error=e)
+
+
+def simulate_user(vector_db, questions_per_user, think_time, role, metrics):
+    """
+    One chat session going through the same steps as search_document.
+
+    Retrieval and generation are timed separately, as well as the question end to end.
+    """
+    from chat.openai_client import OpenAIClient
+    from chat.conversation_handler import ConversationHandler
+    from prompts.prompts import build_answer_prompts
+
+    openai_client = OpenAIClient()
+    conversation_handler = ConversationHandler()
+
+    for _ in range(questions_per_user):
+        query = random.choice(QUESTIONS)
+        question_started = time.perf_counter()
+        try:
+            started = time.perf_counter()
+            try:
+                results = vector_db.search(query, n_results=3)
+            except Exception as e:
+                metrics.record("search", started, error=e)
+                raise
+            metrics.record("search", started)
+
+            system_prompt, user_prompt, context = build_answer_prompts(query, results, role, conversation_handler)
+
+            started = time.perf_counter()
+            try:
+                answer = openai_client.get_response(prompt=user_prompt, system_prompt=system_prompt)
+            except Exception as e:
+                metrics.record("answer", started, error=e)
+                raise
+            metrics.record("answer", started)
+
+            conversation_handler.add_exchange(user_query=query, assistant_response=answer, context_used=context)
+            metrics.record("question", question_started)
+        except Exception as e:
+            metrics.record("question", question_started, error=e)
+
+        time.sleep(random.uniform(0, think_time))
+
+
+def run_load_test(users=50, questions_per_user=5, ingest_users=1, think_time=1.0, role="standard",
+                  pdf_path=None, settings=None, port=8765):
+    """
+    Run the ingest and chat flows with concurrent simulated users against a fake OpenAI server.
+
+    Args:
+        users: Number of concurrent chat sessions
+        questions_per_user: Questions asked per session
+        ingest_users: Number of concurrent document uploads
+        think_time: Maximum pause between questions, in seconds
+        role: Role used for answering
+        pdf_path: Optional PDF to ingest; a synthetic report is generated otherwise
+        settings: FakeOpenAISettings for latency, rate limits and errors
+        port: Port of the fake server
+
+    Returns:
+        Tuple of (Metrics, fake server stats)
+    """
+    metrics = Metrics()
+    workdir = tempfile.mkdtemp(prefix="ragapp_loadtest_")
+
+    with FakeOpenAIServer(settings, port=port) as server:
+        # The OpenAI and Chroma clients pick the fake endpoint up from the environment
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        os.environ["OPENAI_API_KEY"] = "loadtest"
+
+        from database.vector_store import VectorDatabase
+
+        if pdf_path is None:
+            pdf_path = os.path.join(workdir, "sample_report.pdf")
+            make_sample_pdf(pdf_path)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=ingest_users) as executor:
+            for user_id in range(ingest_users):
+                executor.submit(simulate_ingest, pdf_path, workdir, user_id, metrics)
+        metrics.wall_time["ingest"] = time.perf_counter() - started
+
+        # All chat sessions share one processed document, like the Streamlit app
+        vector_db = VectorDatabase(collection_name="loadtest_chat", persist_directory=workdir)
+        vector_db.process_pdf(pdf_path)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=users) as executor:
+            for _ in range(users):
+                executor.submit(simulate_user, vector_db, questions_per_user, think_time, role, metrics)
+        chat_wall_time = time.perf_counter() - started
+        for operation in ("search", "answer", "question"):
+            metrics.wall_time[operation] = chat_wall_time
+
+        return metrics, dict(server.stats)
+
+
+# Usage (from the repository root): PYTHONPATH=src python -m loadtest.harness --users 50 --rate-limit-rpm 500
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the ingest and chat flows against a fake OpenAI server.")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--questions-per-user", type=int, default=5)
+    parser.add_argument("--ingest-users", type=int, default=1)
+    parser.add_argument("--think-time", type=float, default=1.0)
+    parser.add_argument("--role", default="standard")
+    parser.add_argument("--pdf", help="PDF to ingest instead of the synthetic report")
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--embedding-latency-ms", type=float, default=50.0)
+    parser.add_argument("--tokens-per-second", type=float, default=80.0)
+    parser.add_argument("--rate-limit-rpm", type=int, default=None)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    settings = FakeOpenAISettings(
+        latency_ms=args.latency_ms,
+        embedding_latency_ms=args.embedding_latency_ms,
+        tokens_per_second=args.tokens_per_second,
+        rate_limit_rpm=args.rate_limit_rpm,
+        error_rate=args.error_rate
+    )
+    metrics, server_stats = run_load_test(
+        users=args.users,
+        questions_per_user=args.questions_per_user,
+        ingest_users=args.ingest_users,
+        think_time=args.think_time,
+        role=args.role,
+        pdf_path=args.pdf,
+        settings=settings,
+        port=args.port
+    )
+
+    print(metrics.report())
+    print(f"\nFake server: {server_stats['requests']} requests, "
+          f"{server_stats['rate_limited']} rate limited, {server_stats['errors']} injected errors")
+    print("Note: the OpenAI client retries 429 and 5xx responses, so errors above are after retries.")
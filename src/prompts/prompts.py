@@ -1,16 +1,46 @@
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
 # Standard prompts for document Q&A
 STANDARD_SYSTEM_PROMPT = """You are a helpful assistant answering questions about a document.
 Use ONLY the provided excerpts to answer the user's question.
 If the information needed is not in the excerpts, say that you don't have enough information.
 Don't make up or infer information that isn't explicitly stated in the excerpts."""
 
-STANDARD_USER_PROMPT = """I have a question about a document: {query}
+# The user prompt is ordered from stable to volatile (instructions, conversation,
+# excerpts, question) so repeated requests share the longest possible prefix
+# and benefit from provider-side prompt caching. The same template is used with
+# and without conversation history, so every turn extends the previous prefix.
+STANDARD_USER_PROMPT = """I have a question about a document.
+Based ONLY on the excerpts below and our conversation so far (if relevant), please answer my question concisely.
+
+{conversation}Here are the most relevant excerpts from the document:
+
+{context}
+
+My question: {query}"""
+
+# Used when several perspectives answer the same question: everything up to the
+# perspective is identical for every role, so the calls share one cacheable prefix.
+PERSPECTIVE_SYSTEM_PROMPT = """You are an assistant answering questions about a document from a given professional perspective.
+Use ONLY the provided excerpts to answer the user's question.
+Don't make up or infer information that isn't explicitly stated in the excerpts."""
+
+PERSPECTIVE_USER_PROMPT = """I have a question about a document.
+Based ONLY on the excerpts below, please answer my question concisely from the perspective described at the end.
 
 Here are the most relevant excerpts from the document:
 
 {context}
 
-Based ONLY on these excerpts, please answer my question concisely."""
+Perspective:
+{perspective}
+
+My question: {query}"""
 
 # Role-specific system prompts
 ROLE_PROMPTS = {
@@ -59,7 +89,7 @@ def get_system_prompt(role="standard"):
     return ROLE_PROMPTS.get(role, STANDARD_SYSTEM_PROMPT)
 
 
-def format_user_prompt(query, context, role="standard"):
+def format_user_prompt(query, context, role="standard", conversation=""):
     """
     Format the user prompt with the query and context.
     
@@ -67,13 +97,110 @@ def format_user_prompt(query, context, role="standard"):
         query: The user's question
         context: The relevant document excerpts
         role: The role to use for answering
+        conversation: Optional formatted conversation history
         
     Returns:
         Formatted user prompt with query and context
     """
     # For now, we use the same user prompt template for all roles
     # This could be extended to have role-specific user prompts as well
-    return STANDARD_USER_PROMPT.format(query=query, context=context)
+    return STANDARD_USER_PROMPT.format(conversation=conversation, query=query, context=context)
+
+
+@lru_cache(maxsize=None)
+def _get_encoding(model):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except Exception:
+        # Unknown model or encoding files not available locally
+        return None
+
+
+def count_tokens(text, model="gpt-4o-mini"):
+    """
+    Count the tokens in a text with a local tokenizer.
+    
+    Uses tiktoken when it is installed and falls back to an estimate of
+    four characters per token otherwise.
+    
+    Args:
+        text: The text to count
+        model: The model whose tokenizer to use
+        
+    Returns:
+        Number of tokens
+    """
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text))
+
+
+def count_prompt_tokens(system_prompt, user_prompt, model="gpt-4o-mini"):
+    """
+    Count the tokens of a chat prompt, including the per-message overhead.
+    
+    Args:
+        system_prompt: The system prompt
+        user_prompt: The user prompt
+        model: The model whose tokenizer to use
+        
+    Returns:
+        Approximate number of prompt tokens billed by the API
+    """
+    # Each message adds a few tokens for its role and separators
+    return count_tokens(system_prompt, model) + count_tokens(user_prompt, model) + 7
+
+
+def build_answer_prompts(query, results, role="standard", conversation_handler=None):
+    """
+    Build the system and user prompt for answering a query from search results.
+    
+    Args:
+        query: The user's question
+        results: Search results from the vector database
+        role: The role to use for answering
+        conversation_handler: Optional ConversationHandler whose history is included
+        
+    Returns:
+        Tuple of (system prompt, user prompt, formatted context)
+    """
+    context = format_retrieved_context(results)
+    system_prompt = get_system_prompt(role)
+    
+    # The history is included for every question, not just detected follow-ups, so
+    # consecutive turns keep extending the same prompt prefix
+    if conversation_handler is not None:
+        user_prompt = conversation_handler.format_conversational_prompt(query, context)
+    else:
+        user_prompt = format_user_prompt(query, context, role)
+    
+    return system_prompt, user_prompt, context
+
+
+def build_perspective_prompts(query, results, roles):
+    """
+    Build prompts for answering one query from several role perspectives.
+    
+    All roles share the system prompt and the retrieved context; only the
+    perspective and the question at the end of the user prompt differ.
+    
+    Args:
+        query: The user's question
+        results: Search results from the vector database
+        roles: The roles to answer from
+        
+    Returns:
+        Tuple of (shared system prompt, dict of role to user prompt, formatted context)
+    """
+    context = format_retrieved_context(results)
+    user_prompts = {
+        role: PERSPECTIVE_USER_PROMPT.format(context=context, perspective=get_system_prompt(role), query=query)
+        for role in roles
+    }
+    return PERSPECTIVE_SYSTEM_PROMPT, user_prompts, context
 
 
 def format_retrieved_context(results):
@@ -1,10 +1,16 @@
 import streamlit as st
 import os
-import tempfile
-from database.vector_store import VectorDatabase
+import io
+import uuid
+from database.vector_store import VectorDatabase, storage_settings_from_env
 from chat.openai_client import OpenAIClient
-from prompts.prompts import get_system_prompt, format_user_prompt, format_retrieved_context
+from prompts.prompts import build_answer_prompts, build_perspective_prompts, count_prompt_tokens
 from chat.conversation_handler import ConversationHandler
+from chat.batch_answering import answer_questions, parse_questions, ResultWriter
+from chat.conversation_store import ConversationStore
+from chat.perspectives import stream_perspectives
+from chat.answer_cache import AnswerCache, load_warmup_questions, start_warm_up
+from database.table_index import format_lookup_answer
 
 # Set page configuration
 st.set_page_config(
@@ -42,39 +48,141 @@ if "selected_role" not in st.session_state:
     st.session_state.selected_role = "standard"
 if "conversation_handler" not in st.session_state:
     st.session_state.conversation_handler = ConversationHandler()
+if "use_mmr" not in st.session_state:
+    st.session_state.use_mmr = False
+if "mmr_lambda" not in st.session_state:
+    st.session_state.mmr_lambda = 0.5
+if "batch_results_csv" not in st.session_state:
+    st.session_state.batch_results_csv = None
+if "conversation_store" not in st.session_state:
+    st.session_state.conversation_store = ConversationStore("./conversations")
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+if "saved_messages" not in st.session_state:
+    st.session_state.saved_messages = 0
+if "compare_perspectives" not in st.session_state:
+    st.session_state.compare_perspectives = False
+if "answer_cache" not in st.session_state:
+    st.session_state.answer_cache = AnswerCache("./streamlit_chroma_db/answer_cache.sqlite3")
+if "warm_up_answers" not in st.session_state:
+    st.session_state.warm_up_answers = False
 
 # Function to initialize vector database
 def initialize_vector_db():
     vector_db = VectorDatabase(
         collection_name="streamlit_pdf_db",
-        persist_directory="./streamlit_chroma_db"
+        persist_directory="./streamlit_chroma_db",
+        **storage_settings_from_env()
     )
     return vector_db
 
 # Function to process uploaded PDF
 def process_uploaded_pdf(uploaded_file):
-    # Create a temporary file
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_file:
-        tmp_file.write(uploaded_file.getvalue())
-        tmp_file_path = tmp_file.name
-    
     try:
         # Initialize vector database if not already done
         if st.session_state.vector_db is None:
             st.session_state.vector_db = initialize_vector_db()
         
-        # Process the PDF
+        # Process the PDF straight from the upload buffer, without a temporary file
         with st.spinner("Processing PDF... This may take a minute."):
-            chunk_ids, pdf_info = st.session_state.vector_db.process_pdf(tmp_file_path)
+            chunk_ids, pdf_info = st.session_state.vector_db.process_pdf(uploaded_file, filename=uploaded_file.name)
             st.session_state.pdf_processed = True
             st.session_state.pdf_name = uploaded_file.name
-            return True, f"Successfully processed {uploaded_file.name} into {len(chunk_ids)} chunks"
+        
+        # Answers for the previous document no longer apply
+        vector_db = st.session_state.vector_db
+        st.session_state.answer_cache.invalidate(vector_db.document_version)
+        if st.session_state.warm_up_answers:
+            # Answer the common questions in the background, so they are ready when asked
+            start_warm_up(
+                vector_db,
+                OpenAIClient(),
+                st.session_state.answer_cache,
+                load_warmup_questions(os.getenv("WARMUP_QUESTIONS_FILE"))
+            )
+        return True, f"Successfully processed {uploaded_file.name} into {len(chunk_ids)} chunks"
     except Exception as e:
         return False, f"Error processing PDF: {str(e)}"
-    finally:
-        # Remove temp file
-        if os.path.exists(tmp_file_path):
-            os.unlink(tmp_file_path)
+
+# Function to format retrieved excerpts for display
+def format_sources(documents, distances):
+    sources_part = ""
+    for i, (doc, distance) in enumerate(zip(documents, distances)):
+        sources_part += f"**Excerpt {i+1}** (Relevance: {100 - int(distance * 100)}%):\n"
+        sources_part += f"{doc}\n\n"
+    return sources_part
+
+# Function to format prompt token usage for display
+def format_usage(usage):
+    caption = f"Prompt: {usage['prompt_tokens_estimate']} tokens (local count)"
+    if "prompt_tokens" in usage:
+        caption += f" · API: {usage['prompt_tokens']} prompt tokens, {usage['cached_tokens']} cached"
+    return caption
+
+# Function to start a new, empty conversation
+def reset_conversation():
+    st.session_state.chat_history = []
+    st.session_state.conversation_handler = ConversationHandler()
+    st.session_state.session_id = uuid.uuid4().hex
+    st.session_state.saved_messages = 0
+
+# Function to save new messages to the conversation store
+def save_conversation():
+    new_messages = st.session_state.chat_history[st.session_state.saved_messages:]
+    st.session_state.conversation_store.append_messages(
+        st.session_state.session_id,
+        new_messages,
+        pdf_name=st.session_state.pdf_name,
+        document_version=st.session_state.vector_db.document_version if st.session_state.vector_db else None
+    )
+    st.session_state.saved_messages = len(st.session_state.chat_history)
+    return len(new_messages)
+
+# Function to load a stored conversation, resolving excerpts by chunk ID
+def load_conversation(session_id):
+    reset_conversation()
+    st.session_state.session_id = session_id
+    
+    current_version = st.session_state.vector_db.document_version if st.session_state.vector_db else None
+    last_query = None
+    session_version = None
+    for record in st.session_state.conversation_store.iter_records(session_id):
+        if record["type"] == "session":
+            session_version = record.get("document_version")
+            continue
+        
+        if "content" in record:
+            st.session_state.chat_history.append({"role": record["role"], "content": record["content"]})
+            if record["role"] == "user":
+                last_query = record["content"]
+            continue
+        
+        if "perspectives" in record:
+            content = {"perspectives": record["perspectives"]}
+            answer = "\n\n".join(f"{label}: {text}" for label, text in record["perspectives"].items())
+        else:
+            content = {"answer": record["answer"]}
+            answer = record["answer"].removeprefix("**Answer:**\n").strip()
+        
+        source_ids = [source["id"] for source in record["sources"]]
+        distances = [source["distance"] for source in record["sources"]]
+        # Chunk IDs are positional, so they only resolve against the exact document version they came from
+        same_document = current_version is not None and record.get("document_version", session_version) == current_version
+        documents = []
+        if source_ids and same_document:
+            documents = st.session_state.vector_db.get_chunks(source_ids)
+        
+        content.update({
+            "sources": format_sources(documents, distances) if documents else "Sources are not available for the current document.",
+            "source_ids": source_ids,
+            "source_distances": distances,
+            "document_version": record.get("document_version", session_version)
+        })
+        st.session_state.chat_history.append({"role": "assistant", "content": content})
+        if last_query is not None:
+            st.session_state.conversation_handler.add_exchange(user_query=last_query, assistant_response=answer)
+    
+    st.session_state.saved_messages = len(st.session_state.chat_history)
 
 # Function to search the vector database
 def search_document(query, role="standard"):
@@ -85,26 +193,62 @@ def search_document(query, role="standard"):
     if "openai_client" not in st.session_state:
         st.session_state.openai_client = OpenAIClient()
     
-    # Check if this is a follow-up question
-    is_follow_up = st.session_state.conversation_handler.detect_follow_up_question(query)
+    # The document may have been replaced through the API in the meantime
+    st.session_state.vector_db.refresh()
+    
+    # Plain metric questions are answered straight from the table index, without the LLM
+    fact = st.session_state.vector_db.lookup_metric(query)
+    if fact is not None:
+        answer = format_lookup_answer(fact)
+        st.session_state.conversation_handler.add_exchange(
+            user_query=query,
+            assistant_response=answer,
+            context_used=fact["table"]
+        )
+        return {
+            "answer": f"**Answer:**\n{answer}\n\n*Looked up in the document's tables.*\n\n",
+            "sources": f"**Table** (page {fact['page']}):\n\n{fact['table']}\n\n",
+            "source_ids": [],
+            "source_distances": []
+        }
+    
+    # Common questions may have been answered ahead of time after processing the PDF,
+    # retrieved without MMR
+    if (not st.session_state.use_mmr
+            and not st.session_state.conversation_handler.detect_follow_up_question(query)):
+        cached = st.session_state.answer_cache.get(st.session_state.vector_db.document_version, role, query)
+        if cached is not None:
+            documents = st.session_state.vector_db.get_chunks(cached["source_ids"])
+            st.session_state.conversation_handler.add_exchange(
+                user_query=query,
+                assistant_response=cached["answer"],
+                context_used="\n\n".join(documents)
+            )
+            return {
+                "answer": f"**Answer:**\n{cached['answer']}\n\n*Answered ahead of time for this document.*\n\n",
+                "sources": format_sources(documents, cached["source_distances"]),
+                "source_ids": cached["source_ids"],
+                "source_distances": cached["source_distances"]
+            }
     
     # Search the vector database for relevant chunks
-    results = st.session_state.vector_db.search(query, n_results=3)
+    results = st.session_state.vector_db.search(
+        query,
+        n_results=3,
+        mmr=st.session_state.use_mmr,
+        lambda_mult=st.session_state.mmr_lambda
+    )
     
     if not results['documents'] or not results['documents'][0]:
         return "No relevant information found in the document."
     
-    # Format retrieved chunks for context
-    context = format_retrieved_context(results)
-    
-    # Get the appropriate prompts based on the selected role
-    system_prompt = get_system_prompt(role)
-    
-    # Use different prompts for follow-up questions
-    if is_follow_up:
-        user_prompt = st.session_state.conversation_handler.format_conversational_prompt(query, context)
-    else:
-        user_prompt = format_user_prompt(query, context, role)
+    # Build the prompts for the selected role; the recent conversation is included on every turn
+    system_prompt, user_prompt, context = build_answer_prompts(
+        query,
+        results,
+        role,
+        st.session_state.conversation_handler
+    )
     
     # Generate response using OpenAI
     try:
@@ -117,13 +261,11 @@ def search_document(query, role="standard"):
         answer_part = f"**Answer:**\n{answer}\n\n"
         
         # Format the sources part
-        sources_part = ""
-        for i, (doc, distance) in enumerate(zip(
-            results['documents'][0],
-            results['distances'][0]
-        )):
-            sources_part += f"**Excerpt {i+1}** (Relevance: {100 - int(distance * 100)}%):\n"
-            sources_part += f"{doc}\n\n"
+        sources_part = format_sources(results['documents'][0], results['distances'][0])
+        
+        # Local token count of the prompt, plus cache hits reported by the API
+        usage = dict(st.session_state.openai_client.last_usage)
+        usage["prompt_tokens_estimate"] = count_prompt_tokens(system_prompt, user_prompt)
         
         # Add to conversation history - add only the answer part
         st.session_state.conversation_handler.add_exchange(
@@ -135,16 +277,75 @@ def search_document(query, role="standard"):
         # Return both parts separately for rendering
         return {
             "answer": answer_part,
-            "sources": sources_part
+            "sources": sources_part,
+            "source_ids": results['ids'][0],
+            "source_distances": results['distances'][0],
+            "usage": usage
         }
         
     except Exception as e:
         error_msg = f"Error generating response: {str(e)}"
         return {
             "answer": error_msg,
-            "sources": f"Here are the relevant excerpts:\n\n{context}"
+            "sources": f"Here are the relevant excerpts:\n\n{context}",
+            "source_ids": results['ids'][0],
+            "source_distances": results['distances'][0]
         }
     
+# Function to answer from several perspectives with a single retrieval
+def compare_perspectives(query, roles, role_labels):
+    if "openai_client" not in st.session_state:
+        st.session_state.openai_client = OpenAIClient()
+    
+    results = st.session_state.vector_db.search(
+        query,
+        n_results=3,
+        mmr=st.session_state.use_mmr,
+        lambda_mult=st.session_state.mmr_lambda
+    )
+    if not results['documents'] or not results['documents'][0]:
+        st.markdown("No relevant information found in the document.")
+        return "No relevant information found in the document."
+    
+    system_prompt, user_prompts, context = build_perspective_prompts(query, results, roles)
+    
+    # One column per perspective, filled in as the answers stream in
+    placeholders = {}
+    for role, column in zip(roles, st.columns(len(roles))):
+        with column:
+            st.markdown(f"**{role_labels[role]}**")
+            placeholders[role] = st.empty()
+    
+    answers = {role: "" for role in roles}
+    for role, event, payload in stream_perspectives(st.session_state.openai_client, system_prompt, user_prompts):
+        if event == "token":
+            answers[role] += payload
+            placeholders[role].markdown(answers[role] + "▌")
+        elif event == "error":
+            answers[role] += f"\n\nError generating response: {payload}"
+        if event != "token":
+            placeholders[role].markdown(answers[role])
+    
+    st.session_state.conversation_handler.add_exchange(
+        user_query=query,
+        assistant_response="\n\n".join(f"{role_labels[role]}: {answers[role]}" for role in roles),
+        context_used=context
+    )
+    
+    return {
+        "perspectives": {role_labels[role]: answers[role] for role in roles},
+        "sources": format_sources(results['documents'][0], results['distances'][0]),
+        "source_ids": results['ids'][0],
+        "source_distances": results['distances'][0]
+    }
+
+# Function to display answers from several perspectives side by side
+def show_perspectives(perspectives):
+    for (label, answer), column in zip(perspectives.items(), st.columns(len(perspectives))):
+        with column:
+            st.markdown(f"**{label}**")
+            st.markdown(answer)
+
 # Function to handle role selection
 def on_role_change():
     selected_role = st.session_state.role_selector
@@ -185,8 +386,7 @@ with st.sidebar:
             st.session_state.vector_db = None
             st.session_state.pdf_processed = False
             st.session_state.pdf_name = None
-            st.session_state.chat_history = []
-            st.session_state.conversation_handler = ConversationHandler()
+            reset_conversation()
             st.rerun()
 
     # Add a divider
@@ -216,37 +416,104 @@ with st.sidebar:
     
     st.caption("Choose a perspective to receive answers from different viewpoints.")
     
+    # Answer from several perspectives at once, sharing one retrieval
+    st.checkbox("Compare perspectives", key="compare_perspectives")
+    if st.session_state.compare_perspectives:
+        st.multiselect(
+            "Perspectives to compare:",
+            options=list(role_options.keys()),
+            default=list(role_options.keys()),
+            format_func=lambda x: role_options[x],
+            key="compare_roles"
+        )
+    
+    # Retrieval diversification
+    st.checkbox("Diversify excerpts (MMR)", key="use_mmr")
+    if st.session_state.use_mmr:
+        st.slider(
+            "Relevance vs. diversity:",
+            min_value=0.0,
+            max_value=1.0,
+            step=0.1,
+            key="mmr_lambda"
+        )
+        st.caption("Higher values favour relevance, lower values favour distinct excerpts.")
+    
+    # Precompute answers to common questions after processing a PDF
+    st.checkbox("Warm up common questions", key="warm_up_answers")
+    st.caption("Answers common questions in the background after processing, so they are instant when asked.")
+    
+    # Batch question answering
+    if st.session_state.pdf_processed:
+        st.markdown("---")
+        st.header("Batch Questions")
+        question_file = st.file_uploader("Upload a question file", type=["txt", "csv"])
+        st.number_input(
+            "Max requests per minute (0 for no cap):",
+            min_value=0,
+            value=60,
+            step=10,
+            key="batch_requests_per_minute"
+        )
+        
+        if question_file is not None and st.button("Answer All Questions"):
+            if "openai_client" not in st.session_state:
+                st.session_state.openai_client = OpenAIClient()
+            
+            questions = parse_questions(
+                question_file.getvalue().decode("utf-8"),
+                is_csv=question_file.name.lower().endswith(".csv")
+            )
+            output = io.StringIO()
+            writer = ResultWriter(output, "csv")
+            progress = st.progress(0.0, text=f"Answering {len(questions)} questions...")
+            
+            for done, record in enumerate(answer_questions(
+                questions,
+                st.session_state.vector_db,
+                st.session_state.openai_client,
+                role=st.session_state.selected_role,
+                requests_per_minute=st.session_state.batch_requests_per_minute or None
+            ), start=1):
+                writer.write(record)
+                progress.progress(done / len(questions), text=f"Answered {done}/{len(questions)}")
+            
+            st.session_state.batch_results_csv = output.getvalue()
+        
+        if st.session_state.batch_results_csv:
+            st.download_button(
+                "Download Answers (CSV)",
+                data=st.session_state.batch_results_csv,
+                file_name="batch_answers.csv",
+                mime="text/csv"
+            )
+    
     # Conversation management options
-    if st.session_state.chat_history:
+    saved_sessions = st.session_state.conversation_store.list_sessions()
+    if st.session_state.chat_history or saved_sessions:
         st.markdown("---")
         st.header("Conversation")
-        
+    
+    if st.session_state.chat_history:
         col1, col2 = st.columns(2)
         with col1:
             if st.button("Clear Conversation"):
-                st.session_state.chat_history = []
-                # Also clear the conversation handler
-                st.session_state.conversation_handler = ConversationHandler()
+                # Also clears the conversation handler and starts a new session
+                reset_conversation()
                 st.rerun()
         
         with col2:
             if st.button("Save Conversation"):
-                # Generate filename with timestamp
-                import time
-                filename = f"conversation_{int(time.time())}.json"
-                
-                # Convert conversation to JSON
-                import json
-                conversation_data = {
-                    "history": st.session_state.conversation_handler.history,
-                    "chat_display": st.session_state.chat_history
-                }
-                
-                # Save the file
-                with open(filename, "w") as f:
-                    json.dump(conversation_data, f, indent=2)
-                
-                st.success(f"Conversation saved to {filename}")
+                # Only the messages added since the last save are appended
+                saved_count = save_conversation()
+                path = st.session_state.conversation_store.session_path(st.session_state.session_id)
+                st.success(f"Saved {saved_count} new messages to {path}")
+    
+    if saved_sessions:
+        session_to_load = st.selectbox("Saved conversations:", options=saved_sessions)
+        if st.button("Load Conversation"):
+            load_conversation(session_to_load)
+            st.rerun()
 
 # Main chat interface
 st.header("Ask about the document")
@@ -254,10 +521,17 @@ st.header("Ask about the document")
 # Display chat history
 for message in st.session_state.chat_history:
     with st.chat_message(message["role"]):
+        # Answers from several perspectives are shown side by side
+        if isinstance(message.get("content"), dict) and "perspectives" in message["content"]:
+            show_perspectives(message["content"]["perspectives"])
+            with st.expander("View Sources", expanded=False):
+                st.markdown(message["content"]["sources"])
         # If this is a full message with answer and sources
-        if isinstance(message.get("content"), dict) and "answer" in message["content"] and "sources" in message["content"]:
+        elif isinstance(message.get("content"), dict) and "answer" in message["content"] and "sources" in message["content"]:
             # Display answer
             st.markdown(message["content"]["answer"])
+            if message["content"].get("usage"):
+                st.caption(format_usage(message["content"]["usage"]))
             
             # Display sources in a collapsible section
             with st.expander("View Sources", expanded=False):
@@ -282,6 +556,14 @@ if prompt := st.chat_input("Ask a question about the document..."):
             st.markdown(response)
             
             # Add simple string response to chat history
+            st.session_state.chat_history.append({"role": "assistant", "content": response})
+        elif st.session_state.compare_perspectives and st.session_state.get("compare_roles"):
+            response = compare_perspectives(prompt, st.session_state.compare_roles, role_options)
+            if isinstance(response, dict):
+                response["document_version"] = st.session_state.vector_db.document_version
+                with st.expander("View Sources", expanded=False):
+                    st.markdown(f"<div class='source-content'>{response['sources']}</div>", unsafe_allow_html=True)
+            
             st.session_state.chat_history.append({"role": "assistant", "content": response})
         else:
             with st.spinner("Searching document..."):
@@ -290,9 +572,14 @@ if prompt := st.chat_input("Ask a question about the document..."):
                 
                 # Get the response (now as a dict with answer and sources)
                 response = search_document(prompt, st.session_state.selected_role)
+                if isinstance(response, dict):
+                    # Saved conversations only resolve chunk IDs against this document version
+                    response["document_version"] = st.session_state.vector_db.document_version
                 
                 # Display the answer part
                 st.markdown(response["answer"])
+                if response.get("usage"):
+                    st.caption(format_usage(response["usage"]))
                 
                 # For follow-up questions, don't show sources
                 if is_follow_up:
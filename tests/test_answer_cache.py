@@ -0,0 +1,67 @@
+import pytest
+from chat import answer_cache
+from chat.answer_cache import AnswerCache, normalize_question, retrieval_matches_warm_up, warm_up
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return AnswerCache(str(tmp_path / "answer_cache.sqlite3"))
+
+
+def test_normalize_question():
+    assert normalize_question("  What are the MAIN risks?! ") == "what are the main risks"
+
+
+def test_get_returns_answers_for_the_same_version_only(cache):
+    cache.put("v1", "standard", "What are the main risks?", "Currency risk.", ["chunk_1"], [0.2])
+
+    cached = cache.get("v1", "standard", "what are the main risks")
+    assert cached == {
+        "question": "What are the main risks?",
+        "answer": "Currency risk.",
+        "source_ids": ["chunk_1"],
+        "source_distances": [0.2]
+    }
+    assert cache.get("v2", "standard", "What are the main risks?") is None
+    assert cache.get("v1", "economist", "What are the main risks?") is None
+    assert cache.get(None, "standard", "What are the main risks?") is None
+
+
+def test_invalidate_keeps_only_the_given_version(cache):
+    cache.put("v1", "standard", "Question?", "Old", [], [])
+    cache.put("v2", "standard", "Question?", "New", [], [])
+
+    cache.invalidate("v2")
+    assert cache.get("v1", "standard", "Question?") is None
+    assert cache.get("v2", "standard", "Question?")["answer"] == "New"
+
+
+def test_only_default_retrieval_uses_the_cache():
+    assert retrieval_matches_warm_up(answer_cache.WARMUP_N_RESULTS, mmr=False)
+    assert not retrieval_matches_warm_up(answer_cache.WARMUP_N_RESULTS, mmr=True)
+    assert not retrieval_matches_warm_up(answer_cache.WARMUP_N_RESULTS + 2, mmr=False)
+
+
+class FakeVectorDatabase:
+    document_version = "v1"
+
+
+def test_warm_up_stores_generated_answers(cache, monkeypatch):
+    def fake_answer_questions(questions, vector_db, openai_client, role, n_results, max_concurrency):
+        assert n_results == answer_cache.WARMUP_N_RESULTS
+        for question in questions:
+            yield {"question": question, "answer": f"{role}: {question}", "error": "",
+                   "sources": ["chunk_1"], "distances": [0.1]}
+        # Failed answers and table lookups are not cached
+        yield {"question": "Broken?", "answer": "", "error": "timeout", "sources": [], "distances": []}
+        yield {"question": "Revenue?", "answer": "5,432", "error": "", "sources": [], "distances": []}
+
+    monkeypatch.setattr(answer_cache, "answer_questions", fake_answer_questions)
+    cache.put("v0", "standard", "Stale?", "Old", [], [])
+
+    stored = warm_up(FakeVectorDatabase(), None, cache, {"standard": ["Risks?"], "economist": ["Outlook?"]})
+    assert stored == 2
+    assert cache.get("v1", "economist", "Outlook?")["answer"] == "economist: Outlook?"
+    assert cache.get("v1", "standard", "Broken?") is None
+    assert cache.get("v1", "standard", "Revenue?") is None
+    assert cache.get("v0", "standard", "Stale?") is None
@@ -0,0 +1,99 @@
+import json
+import pytest
+from fastapi.testclient import TestClient
+from loadtest.fake_openai import FakeOpenAIServer, FakeOpenAISettings
+from loadtest.harness import make_sample_pdf
+import api.app
+
+PORT = 8792
+
+
+@pytest.fixture(scope="module")
+def settings():
+    return FakeOpenAISettings(latency_ms=0, jitter_ms=0, embedding_latency_ms=0, tokens_per_second=10000)
+
+
+@pytest.fixture(scope="module")
+def fake_openai(settings):
+    with FakeOpenAIServer(settings, port=PORT) as server:
+        yield server
+
+
+@pytest.fixture
+def client(fake_openai, settings, tmp_path, monkeypatch):
+    monkeypatch.setenv("OPENAI_BASE_URL", fake_openai.base_url)
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.delenv("CHROMA_HOST", raising=False)
+    monkeypatch.setattr(api.app, "PERSIST_DIRECTORY", str(tmp_path / "db"))
+    settings.chat_error_rate = 0.0
+    with TestClient(api.app.app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def ingested(client, tmp_path):
+    pdf_path = str(tmp_path / "report.pdf")
+    make_sample_pdf(pdf_path, pages=3)
+    with open(pdf_path, "rb") as f:
+        response = client.post("/documents", params={"filename": "report.pdf"}, content=f.read())
+    assert response.status_code == 200
+    return response.json()
+
+
+def read_events(response):
+    """Parse a Server-Sent Events body into a list of (event, data) tuples."""
+    events = []
+    for block in response.text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_ingest_replaces_the_document(client, ingested):
+    assert ingested["chunks"] > 0
+    assert ingested["warm_up"] is False
+    info = client.get("/documents").json()
+    assert info["pdf_info"]["filename"] == "report.pdf"
+
+
+def test_ingest_rejects_an_empty_body(client):
+    assert client.post("/documents", content=b"").status_code == 400
+
+
+def test_search_returns_sources(client, ingested):
+    response = client.post("/search", json={"query": "What are the main risks?", "n_results": 2})
+    results = response.json()["results"]
+    assert len(results) == 2
+    assert {"id", "document", "metadata", "distance"} <= set(results[0])
+
+
+def test_answer_uses_the_generated_response(client, ingested):
+    response = client.post("/answer", json={"query": "What are the main risks?"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["answer"]
+    assert body["sources"]
+    assert body["usage"]["prompt_tokens"] > 0
+
+
+def test_answer_without_a_document_is_not_found(client):
+    response = client.post("/answer", json={"query": "What are the main risks?"})
+    assert response.status_code == 404
+
+
+def test_stream_emits_sources_then_tokens_then_done(client, ingested):
+    response = client.post("/answer/stream", json={"query": "What is the strategy?"})
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = read_events(response)
+    names = [name for name, _ in events]
+    assert names[0] == "sources"
+    assert names[-1] == "done"
+    assert set(names[1:-1]) == {"token"} and len(names) > 2
+    assert "".join(data for name, data in events if name == "token")
+
+
+def test_stream_reports_generation_errors(client, ingested, settings):
+    # The fake server is adjustable while it runs; every chat completion now fails with HTTP 500
+    settings.chat_error_rate = 1.0
+    events = read_events(client.post("/answer/stream", json={"query": "What is the outlook?"}))
+    assert [name for name, _ in events] == ["sources", "error"]
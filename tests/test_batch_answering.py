@@ -0,0 +1,66 @@
+import csv
+import io
+from chat.batch_answering import ResultWriter, answer_questions, parse_questions
+
+
+class FakeVectorDatabase:
+    def __init__(self):
+        self.searched = []
+
+    def lookup_metric(self, query):
+        return None
+
+    def search_many(self, queries, n_results=3):
+        self.searched.append(list(queries))
+        return [
+            {
+                "ids": [[f"chunk_{i}"]],
+                "documents": [[f"Excerpt about {query}"]],
+                "metadatas": [[{"page": i + 1}]],
+                "distances": [[0.2]]
+            }
+            for i, query in enumerate(queries)
+        ]
+
+
+class FakeOpenAIClient:
+    def get_response(self, prompt, system_prompt):
+        if "fail" in prompt:
+            raise RuntimeError("upstream error")
+        return "An answer"
+
+
+def test_parse_questions_from_text_and_csv():
+    assert parse_questions("First?\n\n Second? \n") == ["First?", "Second?"]
+    assert parse_questions("id,question\n1,First?\n2,\n3,Third?", is_csv=True) == ["First?", "Third?"]
+    assert parse_questions("First?\nSecond?", is_csv=True) == ["First?", "Second?"]
+
+
+def test_answer_questions_uses_one_batched_search():
+    vector_db = FakeVectorDatabase()
+    records = list(answer_questions(["What is revenue?", "Please fail"], vector_db, FakeOpenAIClient()))
+
+    assert vector_db.searched == [["What is revenue?", "Please fail"]]
+    by_index = {record["index"]: record for record in records}
+    assert by_index[0]["answer"] == "An answer"
+    assert by_index[0]["pages"] == [1]
+    assert by_index[1]["error"] == "upstream error"
+
+
+def test_csv_output_cites_pages_and_excerpts():
+    output = io.StringIO()
+    writer = ResultWriter(output, "csv")
+    writer.write({
+        "index": 0,
+        "question": "What is revenue?",
+        "answer": "An answer",
+        "sources": ["chunk_12", "table:page_3"],
+        "pages": [7, 3],
+        "excerpts": ["x" * 400, "| Revenue | 5,488 |"],
+        "distances": [0.2],
+        "error": ""
+    })
+
+    row = next(csv.DictReader(io.StringIO(output.getvalue())))
+    assert row["sources"] == "[chunk_12, p. 7] " + "x" * 300 + "...\n\n[table:page_3, p. 3] | Revenue | 5,488 |"
+    assert "distances" not in row
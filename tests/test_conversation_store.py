@@ -0,0 +1,57 @@
+import gzip
+import os
+from chat.conversation_store import ConversationStore
+
+
+def test_appends_only_new_messages_as_separate_gzip_members(tmp_path):
+    store = ConversationStore(str(tmp_path))
+    store.append_messages("session", [{"role": "user", "content": "What is the revenue?"}],
+                          pdf_name="report.pdf", document_version="v1")
+    store.append_messages("session", [{"role": "assistant", "content": {
+        "answer": "**Answer:**\nEUR 5,488 million",
+        "sources": "Full excerpt text that is not stored",
+        "source_ids": ["chunk_3", "chunk_8"],
+        "source_distances": [0.2, 0.4],
+        "document_version": "v1"
+    }}], pdf_name="report.pdf", document_version="v1")
+
+    header, question, answer = store.iter_records("session")
+    assert header["type"] == "session"
+    assert header["pdf_name"] == "report.pdf"
+    assert header["document_version"] == "v1"
+    assert question == {"type": "message", "role": "user", "content": "What is the revenue?"}
+    assert answer["answer"] == "**Answer:**\nEUR 5,488 million"
+    assert answer["sources"] == [{"id": "chunk_3", "distance": 0.2}, {"id": "chunk_8", "distance": 0.4}]
+    assert answer["document_version"] == "v1"
+
+    # The excerpt text is referenced by chunk ID only
+    with gzip.open(store.session_path("session"), "rt", encoding="utf-8") as f:
+        assert "Full excerpt text" not in f.read()
+
+
+def test_perspective_answers_are_stored(tmp_path):
+    store = ConversationStore(str(tmp_path))
+    store.append_messages("session", [{"role": "assistant", "content": {
+        "perspectives": {"Economist": "Margins improved."},
+        "source_ids": ["chunk_1"],
+        "source_distances": [0.3]
+    }}], document_version="v2")
+
+    _, answer = store.iter_records("session")
+    assert answer["perspectives"] == {"Economist": "Margins improved."}
+    # Messages without their own version fall back to the version passed on save
+    assert answer["document_version"] == "v2"
+
+
+def test_empty_saves_do_not_create_a_session(tmp_path):
+    store = ConversationStore(str(tmp_path))
+    store.append_messages("session", [])
+    assert store.list_sessions() == []
+
+
+def test_list_sessions_most_recent_first(tmp_path):
+    store = ConversationStore(str(tmp_path))
+    for session_id, mtime in (("old", 1000), ("new", 2000)):
+        store.append_messages(session_id, [{"role": "user", "content": "Hi"}])
+        os.utime(store.session_path(session_id), (mtime, mtime))
+    assert store.list_sessions() == ["new", "old"]
@@ -0,0 +1,29 @@
+import httpx
+import pytest
+from loadtest.fake_openai import FakeOpenAIServer, FakeOpenAISettings
+
+PORT = 8791
+
+
+def test_serves_chat_completions_and_embeddings():
+    settings = FakeOpenAISettings(latency_ms=0, embedding_latency_ms=0)
+    with FakeOpenAIServer(settings, port=PORT) as server:
+        response = httpx.post(f"{server.base_url}/chat/completions", json={
+            "model": "gpt-4o-mini",
+            "messages": [{"role": "user", "content": "Hello"}]
+        })
+        assert response.status_code == 200
+        assert response.json()["choices"][0]["message"]["content"]
+
+        response = httpx.post(f"{server.base_url}/embeddings", json={
+            "model": "text-embedding-3-small",
+            "input": ["first", "second"]
+        })
+        assert len(response.json()["data"]) == 2
+        assert server.stats["requests"] == 2
+
+
+def test_start_fails_when_the_port_is_taken():
+    with FakeOpenAIServer(port=PORT):
+        with pytest.raises(RuntimeError):
+            FakeOpenAIServer(port=PORT).start(timeout=5)
@@ -0,0 +1,30 @@
+import numpy as np
+from database.mmr import maximal_marginal_relevance
+
+
+def test_pure_relevance_ranks_by_similarity_to_the_query():
+    query = [1.0, 0.0]
+    candidates = [[0.0, 1.0], [1.0, 0.1], [1.0, 0.5]]
+    assert maximal_marginal_relevance(query, candidates, k=3, lambda_mult=1.0) == [1, 2, 0]
+
+
+def test_diversity_skips_near_duplicates():
+    query = [1.0, 0.0, 0.0]
+    candidates = [
+        [1.0, 0.1, 0.0],
+        [1.0, 0.11, 0.0],  # Near duplicate of the first candidate
+        [0.7, 0.0, 0.7],
+    ]
+    assert maximal_marginal_relevance(query, candidates, k=2, lambda_mult=1.0) == [0, 1]
+    assert maximal_marginal_relevance(query, candidates, k=2, lambda_mult=0.5) == [0, 2]
+
+
+def test_selects_each_candidate_at_most_once():
+    rng = np.random.default_rng(1)
+    candidates = rng.normal(size=(10, 8))
+    selected = maximal_marginal_relevance(rng.normal(size=8), candidates, k=20, lambda_mult=0.3)
+    assert sorted(selected) == list(range(10))
+
+
+def test_no_candidates():
+    assert maximal_marginal_relevance([1.0, 0.0], [], k=3) == []
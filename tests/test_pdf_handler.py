@@ -0,0 +1,54 @@
+import io
+import pytest
+from document_processing.pdf_handler import PDFHandler
+from loadtest.harness import make_sample_pdf
+
+
+class UploadedFile(io.BytesIO):
+    """Stand-in for Streamlit's upload type, a BytesIO subclass."""
+
+
+@pytest.fixture(scope="module")
+def pdf_path(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("pdf") / "report.pdf")
+    make_sample_pdf(path, pages=2)
+    return path
+
+
+@pytest.fixture(scope="module")
+def pdf_bytes(pdf_path):
+    with open(pdf_path, "rb") as f:
+        return f.read()
+
+
+def test_requires_a_path_or_stream():
+    with pytest.raises(ValueError):
+        PDFHandler()
+
+
+@pytest.mark.parametrize("make_stream", [
+    lambda data: data,
+    lambda data: bytearray(data),
+    lambda data: io.BytesIO(data),
+    lambda data: UploadedFile(data),
+], ids=["bytes", "bytearray", "BytesIO", "BytesIO subclass"])
+def test_opens_streams_in_memory(pdf_bytes, make_stream):
+    doc = PDFHandler(pdf_stream=make_stream(pdf_bytes)).open_document()
+    assert doc.page_count == 2
+    doc.close()
+
+
+def test_opens_a_file_object(pdf_path):
+    with open(pdf_path, "rb") as f:
+        pages = list(PDFHandler(pdf_stream=f).iter_markdown_pages())
+    assert len(pages) == 2
+    assert "Section 2.1" in pages[1]
+
+
+def test_stream_and_path_give_the_same_markdown(pdf_path, pdf_bytes):
+    assert PDFHandler(pdf_stream=UploadedFile(pdf_bytes)).extract_markdown() == PDFHandler(pdf_path).extract_markdown()
+
+
+def test_missing_file_is_reported(tmp_path):
+    with pytest.raises(Exception, match="not found"):
+        PDFHandler(str(tmp_path / "missing.pdf")).extract_markdown()
@@ -0,0 +1,59 @@
+import time
+from collections import defaultdict
+from chat.perspectives import stream_perspectives
+
+
+class FakeStreamingClient:
+    """Streams the words of the prompt back, failing halfway for prompts that ask for it."""
+
+    def stream_response(self, prompt, system_prompt):
+        for i, word in enumerate(prompt.split()):
+            if word == "FAIL":
+                raise RuntimeError("generation failed")
+            # Give the other threads a chance, so the streams interleave
+            time.sleep(0.001)
+            yield word if i == 0 else f" {word}"
+
+
+def collect(events):
+    tokens, errors, done = defaultdict(str), {}, defaultdict(int)
+    for role, event, payload in events:
+        if event == "token":
+            tokens[role] += payload
+        elif event == "error":
+            errors[role] = payload
+        else:
+            done[role] += 1
+    return tokens, errors, done
+
+
+def test_tokens_are_merged_per_role():
+    prompts = {
+        "economist": "revenue grew by five percent",
+        "corporate_lawyer": "no material litigation was reported",
+        "critical_journalist": "the outlook lacks supporting figures",
+    }
+    tokens, errors, done = collect(stream_perspectives(FakeStreamingClient(), "system", prompts))
+
+    assert dict(tokens) == prompts
+    assert errors == {}
+    assert dict(done) == {role: 1 for role in prompts}
+
+
+def test_an_error_for_one_role_does_not_stop_the_others():
+    prompts = {"economist": "revenue grew", "corporate_lawyer": "half an answer FAIL never sent"}
+    tokens, errors, done = collect(stream_perspectives(FakeStreamingClient(), "system", prompts))
+
+    assert tokens["economist"] == "revenue grew"
+    assert tokens["corporate_lawyer"] == "half an answer"
+    assert errors == {"corporate_lawyer": "generation failed"}
+    assert dict(done) == {"economist": 1, "corporate_lawyer": 1}
+
+
+def test_done_is_the_last_event_of_each_role():
+    prompts = {"economist": "a b c", "corporate_lawyer": "FAIL"}
+    last_event = {}
+    for role, event, _ in stream_perspectives(FakeStreamingClient(), "system", prompts):
+        assert last_event.get(role) != "done"
+        last_event[role] = event
+    assert last_event == {"economist": "done", "corporate_lawyer": "done"}
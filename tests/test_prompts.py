@@ -0,0 +1,74 @@
+from chat.conversation_handler import ConversationHandler
+from prompts.prompts import build_answer_prompts, build_perspective_prompts, count_prompt_tokens, format_user_prompt
+
+
+def results_for(text):
+    return {"ids": [["chunk_0"]], "documents": [[text]], "distances": [[0.25]]}
+
+
+def conversation_prefix(prompt):
+    return prompt[:prompt.index("Here are the most relevant excerpts")]
+
+
+def test_question_comes_after_the_excerpts():
+    prompt = format_user_prompt("What is the revenue?", "EXCERPT 1: ...")
+    assert prompt.index("EXCERPT 1") < prompt.index("What is the revenue?")
+
+
+def test_first_turn_uses_the_same_template_as_later_turns():
+    handler = ConversationHandler()
+    _, with_handler, _ = build_answer_prompts("What is the revenue?", results_for("Revenue"), "standard", handler)
+    _, without_handler, _ = build_answer_prompts("What is the revenue?", results_for("Revenue"), "standard")
+    assert with_handler == without_handler
+
+
+def count_prefix_rewrites(handler, turns=12):
+    previous = None
+    rewrites = 0
+    for i in range(turns):
+        # Questions that are not detected as follow-ups still keep the conversation in the prompt
+        question = f"What does the report say about topic number {i}?"
+        _, prompt, _ = build_answer_prompts(question, results_for(f"Excerpt {i}"), "standard", handler)
+        prefix = conversation_prefix(prompt)
+        if previous is not None and not prefix.startswith(previous):
+            rewrites += 1
+        previous = prefix
+        handler.add_exchange(question, f"Answer {i}")
+    return rewrites
+
+
+def test_consecutive_turns_extend_the_previous_prefix():
+    # Trimming one exchange per turn rewrites the prefix on every turn once the history is full
+    assert count_prefix_rewrites(ConversationHandler(max_history=5, trim_size=1)) == 6
+    # Trimming in blocks only rewrites it once every three turns
+    assert count_prefix_rewrites(ConversationHandler(max_history=5, trim_size=3)) == 2
+
+
+def test_history_is_trimmed_in_blocks():
+    handler = ConversationHandler(max_history=5, trim_size=3)
+    sizes = []
+    for i in range(9):
+        handler.add_exchange(f"Question {i}", f"Answer {i}")
+        sizes.append(len(handler.history))
+    assert sizes == [1, 2, 3, 4, 5, 3, 4, 5, 3]
+    assert handler.history[0]["user_query"] == "Question 6"
+
+
+def test_count_prompt_tokens_includes_message_overhead():
+    assert count_prompt_tokens("", "") == 7
+    assert count_prompt_tokens("system", "user") > 7
+
+
+def test_perspective_prompts_share_the_prefix_up_to_the_perspective():
+    roles = ["standard", "economist", "corporate_lawyer", "critical_journalist"]
+    system_prompt, user_prompts, context = build_perspective_prompts(
+        "What are the main risks?", results_for("Currency risk"), roles
+    )
+
+    assert set(user_prompts) == set(roles)
+    assert len(set(user_prompts.values())) == len(roles)
+    prefixes = {prompt[:prompt.index("Perspective:")] for prompt in user_prompts.values()}
+    # One shared system prompt and one shared prefix, so the provider can cache them across roles
+    assert len(prefixes) == 1
+    assert context in prefixes.pop()
+    assert "Perspective:" not in system_prompt
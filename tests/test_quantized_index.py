@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+from database.quantized_index import QuantizedIndex, normalize_embeddings
+
+
+@pytest.fixture
+def embeddings():
+    rng = np.random.default_rng(0)
+    return rng.normal(size=(200, 64)).astype(np.float32)
+
+
+def chunk_ids(n):
+    return [f"chunk_{i}" for i in range(n)]
+
+
+def test_normalize_embeddings_truncates_and_normalizes(embeddings):
+    vectors = normalize_embeddings(embeddings, dimensions=16)
+    assert vectors.shape == (200, 16)
+    np.testing.assert_allclose(np.linalg.norm(vectors, axis=1), 1.0, rtol=1e-5)
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        QuantizedIndex(mode="float16")
+
+
+@pytest.mark.parametrize("mode", ["float32", "int8", "binary"])
+def test_search_finds_the_query_vector_itself(embeddings, mode):
+    index = QuantizedIndex(mode=mode)
+    index.build(chunk_ids(len(embeddings)), embeddings)
+
+    ids, distances = index.search(embeddings[17], n_results=3, rescore_multiplier=8)
+    assert ids[0] == "chunk_17"
+    assert distances[0] == pytest.approx(0.0, abs=1e-4)
+    assert distances == sorted(distances)
+
+
+@pytest.mark.parametrize("mode", ["int8", "binary"])
+def test_quantized_modes_hold_fewer_bytes_in_memory(embeddings, mode):
+    exact = QuantizedIndex(mode="float32")
+    exact.build(chunk_ids(len(embeddings)), embeddings)
+    index = QuantizedIndex(mode=mode)
+    index.build(chunk_ids(len(embeddings)), embeddings)
+
+    assert index.memory_bytes() < exact.memory_bytes()
+    # The full-precision vectors used for rescoring are counted in the stored size
+    assert index.storage_bytes() == index.memory_bytes() + exact.memory_bytes()
+
+
+def test_save_and_load_round_trip(embeddings, tmp_path):
+    index_path = str(tmp_path / "collection")
+    index = QuantizedIndex(mode="int8", index_path=index_path)
+    index.build(chunk_ids(len(embeddings)), embeddings)
+    expected = index.search(embeddings[3], n_results=5)
+
+    loaded = QuantizedIndex(mode="int8", index_path=index_path)
+    assert loaded.load()
+    assert loaded.search(embeddings[3], n_results=5) == expected
+    np.testing.assert_allclose(loaded.get_vectors(["chunk_3"])[0], normalize_embeddings(embeddings[3])[0])
+
+    loaded.delete()
+    assert not QuantizedIndex(mode="int8", index_path=index_path).load()
+
+
+@pytest.mark.parametrize("mode", ["int8", "binary"])
+def test_incremental_build_matches_a_single_build(embeddings, mode, tmp_path, monkeypatch):
+    # Small blocks so quantizing also runs over several blocks
+    monkeypatch.setattr("database.quantized_index.BLOCK_ROWS", 32)
+    whole = QuantizedIndex(mode=mode)
+    whole.build(chunk_ids(len(embeddings)), embeddings)
+
+    index = QuantizedIndex(mode=mode, index_path=str(tmp_path / "collection"))
+    index.start()
+    ids = chunk_ids(len(embeddings))
+    for start in range(0, len(embeddings), 50):
+        index.add(ids[start:start + 50], embeddings[start:start + 50])
+    index.finish()
+
+    assert isinstance(index.full_vectors, np.memmap)
+    np.testing.assert_array_equal(index.codes, whole.codes)
+    assert index.search(embeddings[42], n_results=5) == whole.search(embeddings[42], n_results=5)
+
+
+@pytest.mark.parametrize("mode", ["int8", "binary"])
+def test_first_pass_scores_do_not_depend_on_the_block_size(embeddings, mode, monkeypatch):
+    index = QuantizedIndex(mode=mode)
+    index.build(chunk_ids(len(embeddings)), embeddings)
+    query = normalize_embeddings(embeddings[5])[0]
+    expected = index._first_pass_scores(query)
+
+    monkeypatch.setattr("database.quantized_index.BLOCK_ROWS", 7)
+    np.testing.assert_allclose(index._first_pass_scores(query), expected, atol=1e-6)
+
+
+def test_empty_index_returns_no_results():
+    assert QuantizedIndex(mode="int8").search(np.ones(8), n_results=3) == ([], [])
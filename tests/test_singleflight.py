@@ -0,0 +1,108 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from chat.singleflight import AsyncSingleFlight, SingleFlight, make_key
+
+
+def test_make_key_depends_on_every_part():
+    assert make_key("chat", "gpt-4o-mini", "prompt") == make_key("chat", "gpt-4o-mini", "prompt")
+    assert make_key("chat", "gpt-4o-mini", "prompt") != make_key("chat", "gpt-4o-mini", "other prompt")
+
+
+def test_concurrent_calls_share_one_upstream_call():
+    group = SingleFlight()
+    calls = []
+    release = threading.Event()
+
+    def upstream():
+        calls.append(1)
+        release.wait(5)
+        return "result"
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        futures = [executor.submit(group.do, "key", upstream) for _ in range(8)]
+        time.sleep(0.1)
+        release.set()
+        results = [future.result() for future in futures]
+
+    assert results == ["result"] * 8
+    assert len(calls) == 1
+    # Nothing is cached once the call has finished
+    assert group.do("key", lambda: "fresh") == "fresh"
+
+
+def test_errors_are_raised_for_every_caller():
+    group = SingleFlight()
+    release = threading.Event()
+
+    def upstream():
+        release.wait(5)
+        raise RuntimeError("rate limited")
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        futures = [executor.submit(group.do, "key", upstream) for _ in range(3)]
+        time.sleep(0.1)
+        release.set()
+        for future in futures:
+            with pytest.raises(RuntimeError):
+                future.result()
+
+
+def test_stream_subscribers_receive_every_chunk():
+    group = SingleFlight()
+    started = []
+    release = threading.Event()
+
+    def upstream():
+        started.append(1)
+        yield "a"
+        release.wait(5)
+        yield "b"
+
+    first = group.stream("key", upstream)
+    assert next(first) == "a"
+    # A late subscriber first receives the chunks that were already produced
+    second = group.stream("key", upstream)
+    release.set()
+
+    assert list(first) == ["b"]
+    assert list(second) == ["a", "b"]
+    assert len(started) == 1
+
+
+def test_async_calls_share_one_upstream_call():
+    group = AsyncSingleFlight()
+    calls = []
+
+    async def upstream():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def main():
+        return await asyncio.gather(*(group.do("key", upstream) for _ in range(5)))
+
+    assert asyncio.run(main()) == ["result"] * 5
+    assert len(calls) == 1
+
+
+def test_async_stream_is_shared():
+    group = AsyncSingleFlight()
+    calls = []
+
+    async def upstream():
+        calls.append(1)
+        for chunk in ("a", "b", "c"):
+            await asyncio.sleep(0.01)
+            yield chunk
+
+    async def collect():
+        return [chunk async for chunk in group.stream("key", upstream)]
+
+    async def main():
+        return await asyncio.gather(collect(), collect())
+
+    assert asyncio.run(main()) == [["a", "b", "c"], ["a", "b", "c"]]
+    assert len(calls) == 1
@@ -0,0 +1,143 @@
+import pytest
+from database.table_index import TableIndex, format_lookup_answer, parse_number
+
+PAGE = """Key figures (in € million)
+
+| | FY2023 | FY2022 |
+|---|---|---|
+| Revenue 1) | 5,432 1) | 5.012 |
+| Revenue Consumer | 3,100 | 2,900 |
+| Revenue Business | 2,332 | 2,112 |
+| EBITDA | 1,210 | 1,105 |
+| EBITDA margin (%) | 22.3 | 22.0 |
+| Net debt | (1,500) | (1,650) |
+"""
+
+
+@pytest.fixture(params=[False, True], ids=["in-memory", "loaded"])
+def index(request, tmp_path):
+    table_index = TableIndex(index_path=str(tmp_path / "collection"))
+    table_index.add_page(PAGE, page_number=4)
+    table_index.save()
+    if request.param:
+        table_index = TableIndex(index_path=str(tmp_path / "collection"))
+        assert table_index.load()
+    return table_index
+
+
+@pytest.mark.parametrize("cell, expected", [
+    ("1,234", 1234.0),
+    ("1.234.567", 1234567.0),
+    ("12,5", 12.5),
+    ("0.345", 0.345),
+    ("€ 1.234,56", 1234.56),
+    ("(123)", -123.0),
+    ("-4.5%", -4.5),
+    ("5,432 1)", 5432.0),
+    ("(1,500) 2)", -1500.0),
+    ("5,432¹", 5432.0),
+    ("n/a", None),
+    ("", None),
+])
+def test_parse_number(cell, expected):
+    assert parse_number(cell) == expected
+
+
+def test_columns_hold_canonical_metrics(index):
+    assert list(index.metrics[:4]) == ["revenue", "revenue", "revenue", "revenue"]
+    assert list(index.qualifiers[:4]) == ["", "", "consumer", "consumer"]
+
+
+@pytest.mark.parametrize("query, metric", [
+    ("What was the revenue in 2023?", "revenue"),
+    ("Total revenue FY2022", "revenue"),
+    ("Wat was de omzet?", "revenue"),
+    ("What is the EBITDA margin?", None),
+    ("What is the revenue of the consumer segment?", None),
+    ("What are the main risks to revenue?", None),
+    ("What is the revenue guidance for 2024?", None),
+    ("Why did EBITDA develop this way?", None),
+    ("What is our dividend policy?", None),
+])
+def test_recognize_metric(index, query, metric):
+    assert index.recognize_metric(query) == metric
+
+
+def test_lookup_prefers_the_latest_period(index):
+    fact = index.lookup("What was revenue?")
+    assert (fact["label"], fact["period"], fact["value"], fact["page"]) == ("Revenue 1)", "FY2023", 5432.0, 4)
+    assert format_lookup_answer(fact) == "Revenue 1) (FY2023): 5,432 EUR million"
+
+
+def test_lookup_filters_on_year(index):
+    assert index.lookup("What was the EBITDA in 2022?")["value"] == 1105.0
+    assert index.lookup("Net debt 2022")["value"] == -1650.0
+    assert index.lookup("What was the EBITDA in 2019?") is None
+
+
+@pytest.mark.parametrize("query", ["What was revenue in FY2022?", "Total revenue FY2022", "Revenue FY 2022"])
+def test_lookup_matches_fiscal_year_periods(index, query):
+    fact = index.lookup(query)
+    assert (fact["period"], fact["value"]) == ("FY2022", 5012.0)
+
+
+INTERIM_PAGE = """Revenue (in € million)
+
+| | H1 2024 | FY 2023 | H1 2023 | Q3 2023 |
+|---|---|---|---|---|
+| Revenue | 2,700 | 5,432 | 2,550 | 1,390 |
+"""
+
+
+@pytest.fixture
+def interim_index():
+    table_index = TableIndex()
+    table_index.add_page(INTERIM_PAGE, page_number=2)
+    table_index.save()
+    return table_index
+
+
+@pytest.mark.parametrize("query, period, value", [
+    ("What was revenue in FY2023?", "FY2023", 5432.0),
+    ("What was revenue in H1 2023?", "H12023", 2550.0),
+    ("What was revenue in H1 2024?", "H12024", 2700.0),
+    ("Revenue Q3 2023", "Q32023", 1390.0),
+    # A bare year prefers the full year over its quarters and halves
+    ("What was revenue in 2023?", "FY2023", 5432.0),
+    ("What was revenue in 2024?", "H12024", 2700.0),
+    # Without a period the latest full year wins over a more recent half year
+    ("What was revenue?", "FY2023", 5432.0),
+])
+def test_lookup_matches_interim_periods_exactly(interim_index, query, period, value):
+    fact = interim_index.lookup(query)
+    assert (fact["period"], fact["value"]) == (period, value)
+
+
+def test_fiscal_year_question_matches_a_plain_year_column():
+    table_index = TableIndex()
+    table_index.add_page(PAGE.replace("FY2023", "2023").replace("FY2022", "2022"), page_number=1)
+    table_index.save()
+    assert table_index.lookup("What was revenue in FY2022?")["value"] == 5012.0
+
+
+@pytest.mark.parametrize("query", ["What was revenue in FY2024?", "What was revenue in Q1 2023?", "Revenue H2 2023"])
+def test_lookup_without_the_asked_period_falls_back(interim_index, query):
+    assert interim_index.lookup(query) is None
+
+
+@pytest.mark.parametrize("query", [
+    "What is the revenue of the consumer segment?",
+    "What are the main risks to revenue?",
+    "What is the EBITDA margin?",
+    "How many employees?",
+])
+def test_lookup_falls_back_to_the_llm(index, query):
+    assert index.lookup(query) is None
+
+
+def test_lookup_ignores_more_specific_rows(tmp_path):
+    index = TableIndex()
+    index.add_page(PAGE.replace("| Revenue 1) | 5,432 1) | 5.012 |\n", ""), page_number=1)
+    index.save()
+    # Only segment rows exist, so there is no group revenue to answer with
+    assert index.lookup("What was revenue in 2023?") is None
@@ -0,0 +1,64 @@
+import pytest
+from database.vector_store import VectorDatabase
+
+
+@pytest.fixture
+def vector_db(tmp_path, monkeypatch):
+    # Splitting needs no API calls; the key only satisfies the embedding function
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.delenv("OPENAI_BASE_URL", raising=False)
+    return VectorDatabase(collection_name="test_collection", persist_directory=str(tmp_path))
+
+
+def make_page(page_number, paragraphs, words=40):
+    """Markdown page of paragraphs whose words name the page they are on."""
+    return "".join(
+        " ".join([f"p{page_number}-{i}"] * words) + "\n\n"
+        for i in range(paragraphs)
+    )
+
+
+def page_of(chunk):
+    """The page named by the first word of a chunk."""
+    return int(chunk.split()[0].split("-")[0][1:])
+
+
+def test_no_pages_give_no_chunks(vector_db):
+    assert list(vector_db.iter_chunks([])) == []
+    assert list(vector_db.iter_chunks(["", ""])) == []
+
+
+def test_short_pages_are_joined_into_one_chunk(vector_db):
+    chunks = list(vector_db.iter_chunks([make_page(1, 1, words=5), make_page(2, 1, words=5)]))
+    # The carried-over first page starts the chunk, so it is attributed to page 1
+    assert len(chunks) == 1
+    page_number, chunk = chunks[0]
+    assert page_number == 1
+    assert "p1-0" in chunk and "p2-0" in chunk
+
+
+def test_chunks_are_attributed_to_the_page_they_start_on(vector_db):
+    pages = [make_page(1, 6), make_page(2, 6), make_page(3, 6)]
+    chunks = list(vector_db.iter_chunks(pages))
+
+    assert len(chunks) > 3
+    for page_number, chunk in chunks:
+        assert page_number == page_of(chunk)
+    assert [page_number for page_number, _ in chunks] == sorted(page_number for page_number, _ in chunks)
+    assert {page_number for page_number, _ in chunks} == {1, 2, 3}
+
+
+def test_every_paragraph_ends_up_in_a_chunk(vector_db):
+    pages = [make_page(1, 6), "", make_page(3, 6)]
+    text = "".join(chunk for _, chunk in vector_db.iter_chunks(pages))
+    for page_number in (1, 3):
+        for i in range(6):
+            assert f"p{page_number}-{i}" in text
+
+
+def test_an_empty_page_keeps_the_carried_chunk(vector_db):
+    chunks = list(vector_db.iter_chunks([make_page(1, 6), "", make_page(3, 6)]))
+    # Numbering follows the page positions, also across the empty page
+    assert {page_number for page_number, _ in chunks} == {1, 3}
+    for page_number, chunk in chunks:
+        assert page_number == page_of(chunk)